@@ -0,0 +1,18 @@
+"""
+URL configuration used for GET and HEAD requests served under ASGI.
+
+The list and detail reads go to the async views; everything else falls
+through to the regular Avanzablog.urls patterns.
+"""
+from django.urls import path
+from apps.comments.async_views import AsyncCommentsListView
+from apps.likes.async_views import AsyncLikesListView
+from apps.posts.async_views import AsyncListPostsView, AsyncPostDetailView
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('post/', AsyncListPostsView.as_view(), name='list-posts'),
+    path('post/<int:pk>/', AsyncPostDetailView.as_view(), name='post-detail'),
+    path('likes/', AsyncLikesListView.as_view(), name='like-list'),
+    path('comments/', AsyncCommentsListView.as_view(), name='comments-list'),
+] + sync_urlpatterns
@@ -0,0 +1,22 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.handlers.asgi import ASGIRequest
+
+ASYNC_READ_URLCONF = 'Avanzablog.async_urls'
+
+class AsyncReadRoutingMiddleware:
+    """Routes reads to the async views when the request is served under ASGI.
+
+    Under WSGI, and for writes, requests keep the regular ROOT_URLCONF.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest) and request.method in ('GET', 'HEAD'):
+            request.urlconf = ASYNC_READ_URLCONF
+        return self.get_response(request)
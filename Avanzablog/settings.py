@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',    
     'rest_framework',
     
@@ -44,10 +48,12 @@ INSTALLED_APPS = [
     'apps.posts',
     'apps.comments',
     'apps.likes',
+    'apps.monitoring',
     
 ]
 
 MIDDLEWARE = [
+    'apps.monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Avanzablog.middleware.AsyncReadRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'Avanzablog.urls'
@@ -68,6 +75,22 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Paginated list counts: results up to PAGINATION_EXACT_COUNT_LIMIT are counted
+# exactly on every request, larger ones are cached per visibility class for
+# PAGINATION_COUNT_CACHE_TTL seconds, and results the planner estimates above
+# PAGINATION_ESTIMATED_COUNT_THRESHOLD report the estimate instead.
+# Cached counts are also retired by signals through per-class visibility version
+# keys, so every process must use the same cache backend (e.g. Redis or
+# Memcached) once more than one worker runs.
+PAGINATION_EXACT_COUNT_LIMIT = 1000
+PAGINATION_ESTIMATED_COUNT_THRESHOLD = 100000
+PAGINATION_COUNT_CACHE_TTL = 60
+
+# /metrics serves per-route request metrics in the Prometheus text format to
+# staff sessions only. Set the METRICS_TOKEN environment variable to let
+# scrapers in with "Authorization: Bearer <token>".
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -101,6 +124,41 @@ DATABASES = {
     }
 }
 
+# Connection reuse, configured from the environment. On Django 5.1+
+# connections come from a psycopg pool of DB_POOL_MIN_SIZE to
+# DB_POOL_MAX_SIZE connections, waiting up to DB_POOL_TIMEOUT seconds for a
+# free one. DB_POOL=0 turns the pool off; connections are then closed after
+# each request unless DB_CONN_MAX_AGE is set, which keeps one per thread and
+# is only safe under WSGI: under ASGI every request's ORM work runs on a new
+# thread and the connections pile up. Either way, reused connections are
+# checked first unless DB_HEALTH_CHECKS=0.
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+DB_POOL = env_flag('DB_POOL', True) and django.VERSION >= (5, 1)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env_flag('DB_HEALTH_CHECKS', True)
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 0))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
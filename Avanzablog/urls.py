@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from apps.likes.views import LikeViewSet
+from apps.monitoring.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,4 +26,6 @@ urlpatterns = [
     path('post/', include ('apps.posts.urls')),
     path('likes/', include ('apps.likes.urls')),
     path('comments/', include ('apps.comments.urls')),
+    path('internal/', include ('apps.monitoring.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,6 +1,7 @@
 import factory
 from apps.comments.models import Comments
 from apps.posts.factories import PostFactory
+from apps.posts.models import Post
 from apps.users.factories import UserFactory
 
 class CommentsFactory(factory.django.DjangoModelFactory):
@@ -10,3 +11,9 @@ class CommentsFactory(factory.django.DjangoModelFactory):
     post = factory.SubFactory(PostFactory)
     user = factory.SubFactory(UserFactory)
     comment = factory.Faker('sentence', nb_words=10)
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        comment = super()._create(model_class, *args, **kwargs)
+        Post.objects.filter(pk=comment.post_id).update(comment_count=Comments.objects.filter(post_id=comment.post_id).count())
+        return comment
@@ -1,5 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
-from apps.posts.models import Post
+from apps.posts.models import Post, SEARCH_CONFIG
 from apps.users.models import User
 
 class Comments(models.Model):
@@ -7,4 +9,17 @@ class Comments(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=False)
     comment = models.TextField(max_length=200, blank=False)
     timestamp = models.DateTimeField(auto_now_add=True, editable=False)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('comment', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-timestamp'], name='comment_post_feed_idx'),
+            models.Index(fields=['user', '-timestamp'], name='comment_user_feed_idx'),
+            models.Index(fields=['-timestamp', '-id'], name='comment_feed_idx'),
+            GinIndex(fields=['search_vector'], name='comment_search_idx'),
+        ]
 
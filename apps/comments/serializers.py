@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import F
 from .models import Comments
+from apps.posts.models import Post
 from apps.posts.utils import get_accessible_posts
 
 class CommentsSerializer(serializers.ModelSerializer):
@@ -16,4 +18,5 @@ class CommentsSerializer(serializers.ModelSerializer):
         comment = validated_data.get('comment')
         
         Comment = Comments.objects.create(user=user, post=post, comment=comment)
+        Post.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + 1)
         return Comment
\ No newline at end of file
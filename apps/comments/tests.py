@@ -5,6 +5,7 @@ from apps.comments.factories import CommentsFactory
 from apps.users.factories import UserFactory, TeamFactory
 from apps.posts.factories import PostFactory, CategoriesFactory
 from .models import Comments
+from apps.posts.models import Post
 
 class CommentViewSetTest(APITestCase):
 
@@ -90,6 +91,17 @@ class CommentViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Comments.objects.count(), 5)
        
+    def test_comment_count_follows_create_and_delete(self):
+        self.client.force_authenticate(user=self.user2)
+        data = {'post': self.post2.id, 'comment': 'Test comment'}
+        response = self.client.post(reverse('comments-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).comment_count, 2)
+
+        response = self.client.delete(reverse('comments-detail', kwargs={'pk': response.data['id']}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).comment_count, 1)
+
     def test_create_comment_in_unexistent_post(self):
         self.client.force_authenticate(user=self.user2)
         url = reverse('comments-list')
@@ -3,12 +3,15 @@ from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from .models import Comments
 from apps.posts.models import Post
 from .serializers import CommentsSerializer
 from .pagination import CommentsPagination
-from apps.posts.utils import get_accessible_posts
+from apps.posts.utils import accessible_post_ids
+from apps.posts.access import can_read_post, post_exists
 
 class CommentsViewSet(viewsets.ModelViewSet):
     queryset = Comments.objects.none()
@@ -20,27 +23,27 @@ class CommentsViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         current_user = self.request.user
-        accessible_posts = get_accessible_posts(current_user)
+        accessible_ids = accessible_post_ids(current_user)
         post_id = self.request.query_params.get('post')
         if post_id:
-            if not accessible_posts.filter(id=post_id).exists():
+            if not can_read_post(self.request, post_id):
                 self.permission_denied(self.request, message="Permission denied.")
-        return Comments.objects.filter(post_id__in=accessible_posts).order_by('-timestamp')
+        queryset = Comments.objects.all()
+        if accessible_ids is not None:
+            queryset = queryset.filter(post_id__in=accessible_ids)
+        return queryset.order_by('-timestamp')
 
     def create(self, request, *args, **kwargs):
         user = request.user
         post_id = request.data.get('post')
                 
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+        if not post_exists(request, post_id):
             return Response({"detail": "Post not found."}, status=404)
         
-        accessible_posts = get_accessible_posts(user)
-        if post not in accessible_posts:
+        if not can_read_post(request, post_id):
             return Response({"detail": "Permission denied."}, status=400)
         
-        data = {'user': user.id, 'post': post.id, 'comment': request.data.get('comment')}
+        data = {'user': user.id, 'post': post_id, 'comment': request.data.get('comment')}
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -51,14 +54,16 @@ class CommentsViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         Comment = get_object_or_404(Comments, pk=self.kwargs['pk'])        
         user = request.user
-        post = Comment.post
+        post_id = Comment.post_id
         
-        accessible_posts = get_accessible_posts(user)
-        if post not in accessible_posts:
+        if not can_read_post(request, post_id):
             return Response({"detail": "Permission denied."}, status=403)
-        if Comment.user != user and not user.is_admin:
+        if Comment.user_id != user.id and not user.is_admin:
             return Response({"detail": "You do not have permission to delete this like."}, status=403)
-        Comment.delete()
+        with transaction.atomic():
+            deleted, _ = Comment.delete()
+            if deleted:
+                Post.objects.filter(pk=post_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
         return Response({"detail": "Comment deleted."}, status=204)
     
     def permission_denied(self, request, message=None, code=None):
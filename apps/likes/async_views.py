@@ -0,0 +1,25 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import PermissionDenied
+from apps.posts.access import acan_read_post
+from apps.posts.async_views import AsyncFeedView
+from apps.posts.utils import accessible_post_ids
+from .models import Like
+from .pagination import LikesPagination
+from .serializers import LikeSerializer
+
+class AsyncLikesListView(AsyncFeedView):
+    serializer_class = LikeSerializer
+    pagination_class = LikesPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['post', 'user']
+
+    async def get_queryset(self, request):
+        accessible_ids = accessible_post_ids(request.user)
+        post_id = request.query_params.get('post')
+        if post_id:
+            if not await acan_read_post(request, post_id):
+                raise PermissionDenied(detail={"detail": "Permission denied."})
+        queryset = Like.objects.all()
+        if accessible_ids is not None:
+            queryset = queryset.filter(post_id__in=accessible_ids)
+        return queryset.order_by('-timestamp')
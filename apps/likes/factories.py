@@ -1,6 +1,7 @@
 import factory
 from factory.django import DjangoModelFactory
 from apps.posts.factories import PostFactory
+from apps.posts.models import Post
 from apps.users.factories import UserFactory
 from .models import Like
 
@@ -10,4 +11,10 @@ class LikeFactory(DjangoModelFactory):
         django_get_or_create = ('post', 'user')
 
     post = factory.SubFactory(PostFactory)
-    user = factory.SubFactory(UserFactory)
\ No newline at end of file
+    user = factory.SubFactory(UserFactory)
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        like = super()._create(model_class, *args, **kwargs)
+        Post.objects.filter(pk=like.post_id).update(like_count=Like.objects.filter(post_id=like.post_id).count())
+        return like
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:08
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so the hot tables stay writable while the indexes build.
+    atomic = False
+
+    dependencies = [
+        ('likes', '0005_like_timestamp'),
+        ('posts', '0012_post_author_team'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(fields=['post', '-timestamp'], name='like_post_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(fields=['user', '-timestamp'], name='like_user_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='like',
+            index=models.Index(fields=['-timestamp', '-id'], name='like_feed_idx'),
+        ),
+    ]
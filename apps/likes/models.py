@@ -9,4 +9,9 @@ class Like(models.Model):
     
     class Meta:
         unique_together = ('post', 'user')
+        indexes = [
+            models.Index(fields=['post', '-timestamp'], name='like_post_feed_idx'),
+            models.Index(fields=['user', '-timestamp'], name='like_user_feed_idx'),
+            models.Index(fields=['-timestamp', '-id'], name='like_feed_idx'),
+        ]
 
@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from .models import Like
+from apps.posts.models import Post
 from apps.posts.utils import get_accessible_posts
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -7,13 +10,30 @@ class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
         fields = ['id', 'post', 'user']
+        # The (post, user) unique constraint is enforced by the insert in create, not by a lookup beforehand.
+        validators = []
 
+    @transaction.atomic
     def create(self, validated_data):
-        user = validated_data.get('user')
-        post = validated_data.get('post')
-
-        like, created = Like.objects.get_or_create(user=user, post=post)
-        if not created:
+        try:
+            with transaction.atomic():
+                like = Like.objects.create(**validated_data)
+        except IntegrityError:
             raise serializers.ValidationError({"detail": "Like already exists."})
-        
-        return like
\ No newline at end of file
+
+        Post.objects.filter(pk=like.post_id).update(like_count=F('like_count') + 1)
+        return like
+
+class LikeBatchSerializer(serializers.Serializer):
+    like = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=100)
+    unlike = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=100)
+
+    def validate(self, data):
+        data['like'] = list(dict.fromkeys(data['like']))
+        data['unlike'] = list(dict.fromkeys(data['unlike']))
+        if not data['like'] and not data['unlike']:
+            raise serializers.ValidationError("Provide at least one post to like or unlike.")
+        if set(data['like']) & set(data['unlike']):
+            raise serializers.ValidationError("A post cannot be liked and unliked in the same batch.")
+        return data
+
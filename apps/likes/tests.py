@@ -1,10 +1,14 @@
-from rest_framework.test import APITestCase
+import threading
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
 from apps.likes.factories import LikeFactory
 from apps.users.factories import UserFactory, TeamFactory
 from apps.posts.factories import PostFactory, CategoriesFactory
 from apps.likes.models import Like
+from apps.posts.models import Post
 
 class LikeViewSetTest(APITestCase):
 
@@ -105,6 +109,87 @@ class LikeViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(Like.objects.count(), 4)
     
+    def test_like_count_follows_create_and_delete(self):
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.post(reverse('like-list'), {'post': self.post2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 2)
+
+        response = self.client.delete(reverse('like-detail', kwargs={'pk': response.data['id']}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 1)
+
+    def test_batch_like_and_unlike(self):
+        self.client.force_authenticate(user=self.user2)
+        url = reverse('like-batch')
+        data = {'like': [self.post2.id, self.post5.id, self.post3.id, 999999], 'unlike': [self.post1.id]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {(item['post'], item['action']): item['result'] for item in response.data['results']}
+        self.assertEqual(results[(self.post2.id, 'like')], 'liked')
+        self.assertEqual(results[(self.post5.id, 'like')], 'already_liked')
+        self.assertEqual(results[(self.post3.id, 'like')], 'permission_denied')
+        self.assertEqual(results[(999999, 'like')], 'not_found')
+        self.assertEqual(results[(self.post1.id, 'unlike')], 'permission_denied')
+        self.assertTrue(Like.objects.filter(post=self.post2, user=self.user2).exists())
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 2)
+        self.assertEqual(Post.objects.get(pk=self.post5.pk).like_count, 2)
+
+        response = self.client.post(url, {'unlike': [self.post2.id, self.post5.id, self.post4.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['result'] for item in response.data['results']], ['unliked', 'unliked', 'permission_denied'])
+        self.assertEqual(Like.objects.filter(user=self.user2).count(), 0)
+        self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 1)
+        self.assertEqual(Post.objects.get(pk=self.post5.pk).like_count, 1)
+
+    def test_batch_like_validation(self):
+        self.client.force_authenticate(user=self.user2)
+        url = reverse('like-batch')
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'like': [self.post2.id], 'unlike': [self.post2.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=None)
+        response = self.client.post(url, {'like': [self.post1.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_toggle_like(self):
+        self.client.force_authenticate(user=self.user2)
+        url = reverse('like-post', kwargs={'post_id': self.post2.id})
+        for changed in (True, False):
+            response = self.client.put(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {'post': self.post2.id, 'liked': True, 'changed': changed})
+            self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 2)
+        self.assertTrue(Like.objects.filter(post=self.post2, user=self.user2).exists())
+
+        for changed in (True, False):
+            response = self.client.delete(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {'post': self.post2.id, 'liked': False, 'changed': changed})
+            self.assertEqual(Post.objects.get(pk=self.post2.pk).like_count, 1)
+        self.assertFalse(Like.objects.filter(post=self.post2, user=self.user2).exists())
+
+    def test_toggle_like_queries(self):
+        self.client.force_authenticate(user=self.user2)
+        url = reverse('like-post', kwargs={'post_id': self.post5.id})
+        # The post's access columns, then the like and its counter in one statement.
+        with self.assertNumQueries(2):
+            self.client.delete(url, format='json')
+        with self.assertNumQueries(2):
+            self.client.put(url, format='json')
+
+    def test_toggle_like_permissions(self):
+        response = self.client.put(reverse('like-post', kwargs={'post_id': self.post1.id}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.put(reverse('like-post', kwargs={'post_id': self.post3.id}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete(reverse('like-post', kwargs={'post_id': 999999}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Like.objects.count(), 4)
+
     def test_delete_like_with_permissions(self):
         self.client.force_authenticate(user=self.user1)
         url = reverse('like-detail', kwargs={'pk': self.like3.id})
@@ -186,4 +271,73 @@ class LikeViewSetTest(APITestCase):
         url = reverse('like-list')
         response = self.client.get(url, {'post': self.post1.id}, format='json')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-  
\ No newline at end of file
+
+
+class HotPostLikeConcurrencyTest(TransactionTestCase):
+
+    def setUp(self):
+        self.Public_category = CategoriesFactory(category_name='Public')
+        self.Authenticated_category = CategoriesFactory(category_name='Authenticated')
+        self.author = UserFactory(username="author", email="author@example.com", team=TeamFactory())
+        self.post = PostFactory(author=self.author, title='hot post',
+            permissions_set=[{'category': self.Authenticated_category, 'access': 'read'}])
+        self.users = [UserFactory(team=TeamFactory()) for _ in range(16)]
+
+    def test_concurrent_likes_keep_like_count_exact(self):
+        barrier = threading.Barrier(len(self.users))
+        statuses = []
+
+        def like_and_unlike(user, unlike):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                response = client.post(reverse('like-list'), {'post': self.post.id}, format='json')
+                statuses.append(response.status_code)
+                if unlike:
+                    response = client.delete(reverse('like-detail', kwargs={'pk': response.data['id']}), format='json')
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=like_and_unlike, args=(user, i % 4 == 0))
+            for i, user in enumerate(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 16)
+        self.assertEqual(statuses.count(status.HTTP_204_NO_CONTENT), 4)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 12)
+        self.assertEqual(self.post.like_count, Like.objects.filter(post=self.post).count())
+
+
+    def test_concurrent_toggles_keep_like_count_exact(self):
+        barrier = threading.Barrier(len(self.users))
+        statuses = []
+
+        def double_tap(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            url = reverse('like-post', kwargs={'post_id': self.post.id})
+            try:
+                barrier.wait()
+                statuses.append(client.put(url, format='json').status_code)
+                statuses.append(client.put(url, format='json').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=double_tap, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 32)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 16)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 16)
@@ -0,0 +1,39 @@
+from django.db import connection
+from .models import Like
+from apps.posts.models import Post
+
+def add_likes(user, post_ids):
+    """Likes every post in post_ids for user, skipping existing likes.
+
+    Runs a single statement: an INSERT ... ON CONFLICT DO NOTHING whose new
+    rows bump their posts' like_count. Returns the ids of the posts that
+    were newly liked.
+    """
+    if not post_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH liked AS ('
+            f'INSERT INTO {Like._meta.db_table} (post_id, user_id, timestamp) '
+            'SELECT post_id, %s, NOW() FROM UNNEST(%s::bigint[]) AS post_id '
+            'ON CONFLICT (post_id, user_id) DO NOTHING RETURNING post_id) '
+            f'UPDATE {Post._meta.db_table} SET like_count = like_count + 1 '
+            'WHERE id IN (SELECT post_id FROM liked) RETURNING id',
+            [user.id, list(post_ids)],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+def remove_likes(user, post_ids):
+    """Removes user's likes on post_ids with a single DELETE and returns the ids of the posts that were unliked."""
+    if not post_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH unliked AS ('
+            f'DELETE FROM {Like._meta.db_table} WHERE user_id = %s AND post_id = ANY(%s::bigint[]) '
+            'RETURNING post_id) '
+            f'UPDATE {Post._meta.db_table} SET like_count = GREATEST(like_count - 1, 0) '
+            'WHERE id IN (SELECT post_id FROM unliked) RETURNING id',
+            [user.id, list(post_ids)],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,14 +1,19 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
+from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from .models import Like
-from apps.posts.models import Post
-from .serializers import LikeSerializer
+from apps.posts.models import Post, ACCESS_READ
+from .serializers import LikeSerializer, LikeBatchSerializer
 from .pagination import LikesPagination
-from apps.posts.utils import get_accessible_posts
+from .utils import add_likes, remove_likes
+from apps.posts.utils import accessible_post_ids
+from apps.posts.access import can_read_post, get_access_level, get_access_levels, post_exists
 
 class LikeViewSet(viewsets.ModelViewSet):
     serializer_class = LikeSerializer
@@ -20,27 +25,27 @@ class LikeViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         current_user = self.request.user
-        accessible_posts = get_accessible_posts(current_user)
+        accessible_ids = accessible_post_ids(current_user)
         post_id = self.request.query_params.get('post')
         if post_id:
-            if not accessible_posts.filter(id=post_id).exists():
+            if not can_read_post(self.request, post_id):
                 self.permission_denied(self.request, message="Permission denied.")
-        return Like.objects.filter(post_id__in=accessible_posts).distinct().order_by('-timestamp')
+        queryset = Like.objects.all()
+        if accessible_ids is not None:
+            queryset = queryset.filter(post_id__in=accessible_ids)
+        return queryset.order_by('-timestamp')
 
     def create(self, request, *args, **kwargs):
         user = request.user
         post_id = request.data.get('post')
                 
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+        if not post_exists(request, post_id):
             return Response({"detail": "Post not found."}, status=404)
         
-        accessible_posts = get_accessible_posts(user)
-        if post not in accessible_posts:
+        if not can_read_post(request, post_id):
             return Response({"detail": "Permission denied."}, status=400)
 
-        data = {'user': user.id, 'post': post.id}
+        data = {'user': user.id, 'post': post_id}
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -50,15 +55,58 @@ class LikeViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         like = get_object_or_404(Like, pk=self.kwargs['pk'])
         user = request.user
-        post = like.post       
-        accessible_posts = get_accessible_posts(user)
-        if post not in accessible_posts:
+        post_id = like.post_id       
+        if not can_read_post(request, post_id):
             return Response({"detail": "Permission denied."}, status=403)
-        if like.user != user and not user.is_admin:
+        if like.user_id != user.id and not user.is_admin:
             return Response({"detail": "You do not have permission to delete this like."}, status=403)
-        like.delete()
+        with transaction.atomic():
+            deleted, _ = like.delete()
+            if deleted:
+                Post.objects.filter(pk=post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
         return Response({"detail": "Like deleted."}, status=204)
     
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = LikeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        like_ids = serializer.validated_data['like']
+        unlike_ids = serializer.validated_data['unlike']
+
+        levels = get_access_levels(request, like_ids + unlike_ids)
+        readable = {post_id: level >= ACCESS_READ for post_id, level in levels.items()}
+        liked = set(add_likes(request.user, [post_id for post_id in like_ids if readable.get(post_id)]))
+        unliked = set(remove_likes(request.user, [post_id for post_id in unlike_ids if readable.get(post_id)]))
+
+        results = []
+        for action_name, post_ids, changed, outcome, unchanged in [
+            ('like', like_ids, liked, 'liked', 'already_liked'),
+            ('unlike', unlike_ids, unliked, 'unliked', 'not_liked'),
+        ]:
+            for post_id in post_ids:
+                if post_id not in readable:
+                    result = 'not_found'
+                elif not readable[post_id]:
+                    result = 'permission_denied'
+                else:
+                    result = outcome if post_id in changed else unchanged
+                results.append({'post': post_id, 'action': action_name, 'result': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['put', 'delete'], url_path=r'post/(?P<post_id>\d+)', url_name='post')
+    def toggle(self, request, post_id):
+        """PUT likes and DELETE unlikes post_id for the current user; repeating either changes nothing."""
+        level = get_access_level(request, post_id)
+        if level is None:
+            return Response({"detail": "Post not found."}, status=404)
+        if level < ACCESS_READ:
+            self.permission_denied(request, message="Permission denied.")
+
+        post_id = int(post_id)
+        liked = request.method == 'PUT'
+        changed = (add_likes if liked else remove_likes)(request.user, [post_id])
+        return Response({'post': post_id, 'liked': liked, 'changed': bool(changed)}, status=status.HTTP_200_OK)
+
     def permission_denied(self, request, message=None, code=None):
         response_data = {"detail": message or "Permission denied."}
         response_status = status.HTTP_403_FORBIDDEN
@@ -0,0 +1,263 @@
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from apps.comments.models import Comments
+from apps.likes.models import Like
+from apps.posts.management.commands.benchmark_feed import Command as FeedBenchmark, sentence
+from apps.posts.models import Post
+from apps.posts.utils import get_accessible_posts
+from apps.users.models import Team, User
+
+SIZES = {
+    'small': {'posts': 2_000, 'users': 200, 'teams': 20, 'comments': 5_000, 'likes': 10_000},
+    'medium': {'posts': 50_000, 'users': 2_000, 'teams': 100, 'comments': 100_000, 'likes': 200_000},
+    'large': {'posts': 1_000_000, 'users': 10_000, 'teams': 500, 'comments': 2_000_000, 'likes': 4_000_000},
+}
+AUDIENCES = ['anonymous', 'regular', 'team-member', 'admin']
+PERMISSIONS = [
+    {'category': 'Public', 'access': 'read'},
+    {'category': 'Authenticated', 'access': 'read'},
+    {'category': 'Team', 'access': 'read_edit'},
+    {'category': 'Author', 'access': 'read_edit'},
+]
+
+
+class Command(BaseCommand):
+    help = ('Measures p50/p95/p99 latency and query counts of every API endpoint for anonymous, regular, '
+            'team-member and admin users, writes a JSON report and compares it with a baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(SIZES), default='small', help='Dataset size to seed and report.')
+        for name in SIZES['small']:
+            parser.add_argument(f'--{name}', type=int, help=f'Overrides the number of {name} of --size.')
+        parser.add_argument('--seed', action='store_true', help='Seed missing rows before benchmarking.')
+        parser.add_argument('--random-seed', type=int, default=42, help='Seeds the data generator.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per endpoint and audience.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests before measuring.')
+        parser.add_argument('--output', help='Writes the JSON report to this file.')
+        parser.add_argument('--baseline', help='JSON report to compare against.')
+        parser.add_argument('--metric', choices=['p50_ms', 'p95_ms', 'p99_ms'], default='p95_ms',
+                            help='Latency compared with the baseline.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative latency increase over the baseline.')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Latency increases below this many milliseconds never count as regressions.')
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] if options[name] is not None else value
+                  for name, value in SIZES[options['size']].items()}
+        random.seed(options['random_seed'])
+        if options['seed']:
+            self.seed(counts, options)
+        users = self.audience_users()
+        if not Post.objects.exists():
+            raise CommandError('No posts to benchmark; run with --seed.')
+
+        results = {}
+        # The test client's default host is not in ALLOWED_HOSTS outside the test runner.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for audience in AUDIENCES:
+                client = Client()
+                if users[audience] is not None:
+                    client.force_login(users[audience])
+                user = users[audience] or AnonymousUser()
+                for name, method, path, data in self.endpoints(user):
+                    results.setdefault(name, {})[audience] = self.measure(client, method, path, data, options)
+
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'size': options['size'],
+                'rows': {
+                    'posts': Post.objects.count(), 'users': User.objects.count(),
+                    'comments': Comments.objects.count(), 'likes': Like.objects.count(),
+                },
+                'repeat': options['repeat'],
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = self.compare(report, json.load(baseline), options)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s):\n' + '\n'.join(regressions))
+            self.stdout.write('No regressions against the baseline.')
+
+    def endpoints(self, user):
+        """(name, method, path, body) of every endpoint, against rows the user can read.
+
+        Writes only run for signed-in users and are rolled back, so every
+        run sees the same data.
+        """
+        post = get_accessible_posts(user).first() or Post.objects.order_by('-timestamp').first()
+        comment = Comments.objects.filter(post=post).first() or Comments.objects.order_by('id').first()
+        like = Like.objects.filter(post=post).first() or Like.objects.order_by('id').first()
+        word = post.title.split()[0].lower() if post.title.split() else 'post'
+        page = ','.join(map(str, get_accessible_posts(user).values_list('id', flat=True)[:20])) or str(post.pk)
+
+        endpoints = [
+            ('posts.list', 'get', '/post/', None),
+            ('posts.list.page-2', 'get', '/post/?page=2', None),
+            ('posts.list.cursor', 'get', '/post/?pagination=cursor', None),
+            ('posts.list.summary', 'get', '/post/?fields=id,author,title,excerpt,timestamp', None),
+            ('posts.detail', 'get', f'/post/{post.pk}/', None),
+            ('posts.search', 'get', f'/post/search/?q={word}', None),
+            ('posts.search.titles', 'get', f'/post/search/titles/?q={word[:3]}', None),
+            ('posts.engagement', 'get', f'/post/engagement/?ids={page}', None),
+            ('comments.list', 'get', '/comments/', None),
+            ('comments.list.post', 'get', f'/comments/?post={post.pk}', None),
+            ('likes.list', 'get', '/likes/', None),
+            ('likes.list.post', 'get', f'/likes/?post={post.pk}', None),
+        ]
+        if comment:
+            endpoints.append(('comments.detail', 'get', f'/comments/{comment.pk}/', None))
+        if like:
+            endpoints.append(('likes.detail', 'get', f'/likes/{like.pk}/', None))
+        if user.is_authenticated:
+            batch = list(get_accessible_posts(user).values_list('id', flat=True)[:10])
+            endpoints += [
+                ('posts.create', 'post', '/post/',
+                 {'title': 'Benchmark post', 'content': sentence(40), 'permissions_set': PERMISSIONS}),
+                ('comments.create', 'post', '/comments/', {'post': post.pk, 'comment': 'Benchmark comment'}),
+                ('likes.create', 'post', '/likes/', {'post': post.pk}),
+                ('likes.toggle', 'put', f'/likes/post/{post.pk}/', {}),
+                ('likes.batch', 'post', '/likes/batch/', {'like': batch[:5], 'unlike': batch[5:]}),
+            ]
+        return endpoints
+
+    def measure(self, client, method, path, data, options):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def request():
+            if data is None:
+                return getattr(client, method)(path)
+            with transaction.atomic():
+                response = getattr(client, method)(path, data, content_type='application/json')
+                transaction.set_rollback(True)
+            return response
+
+        for _ in range(options['warmup']):
+            request()
+        with connection.execute_wrapper(count):
+            response = request()
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(max(options['repeat'], 2)):
+            start = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+        return {
+            'status': response.status_code,
+            'queries': query_count,
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+        }
+
+    def compare(self, report, baseline, options):
+        metric = options['metric']
+        regressions = []
+        self.stdout.write(f"\n{'endpoint':<24}{'audience':<13}{'baseline':>10}{'now':>10}{'change':>9}  note")
+        for name, audiences in report['results'].items():
+            for audience, result in audiences.items():
+                before = baseline.get('results', {}).get(name, {}).get(audience)
+                if before is None:
+                    self.stdout.write(f"{name:<24}{audience:<13}{'':>10}{result[metric]:>10.2f}{'':>9}  new")
+                    continue
+                change = (result[metric] - before[metric]) / before[metric] if before[metric] else 0
+                notes = []
+                if (result[metric] > before[metric] * (1 + options['threshold'])
+                        and result[metric] - before[metric] >= options['min_delta_ms']):
+                    notes.append(f'{metric} {before[metric]:.2f} -> {result[metric]:.2f} ms')
+                if result['queries'] > before['queries']:
+                    notes.append(f"queries {before['queries']} -> {result['queries']}")
+                if result['status'] != before['status']:
+                    notes.append(f"status {before['status']} -> {result['status']}")
+                if notes:
+                    regressions.append(f"{name} as {audience}: {', '.join(notes)}")
+                self.stdout.write(f"{name:<24}{audience:<13}{before[metric]:>10.2f}{result[metric]:>10.2f}"
+                                  f"{change:>+9.0%}  {', '.join(notes)}")
+        return regressions
+
+    def print_report(self, report):
+        self.stdout.write(f"{'endpoint':<24}{'audience':<13}{'status':>7}{'queries':>9}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, audiences in report['results'].items():
+            for audience, result in audiences.items():
+                self.stdout.write(f"{name:<24}{audience:<13}{result['status']:>7}{result['queries']:>9}"
+                                  f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+    def audience_users(self):
+        """The signed-in users benchmarked, created on first use.
+
+        The regular user is alone in their team and the team member shares
+        a team with other users, since get_accessible_posts treats the two
+        differently.
+        """
+        solo_team, _ = Team.objects.get_or_create(tname='bench-api-solo')
+        shared_team = (Team.objects.exclude(pk=solo_team.pk).filter(user__isnull=False)
+                       .order_by('id').first()) or Team.objects.get_or_create(tname='bench-api-shared')[0]
+        users = {'anonymous': None}
+        for audience, team, is_admin in [('regular', solo_team, False), ('team-member', shared_team, False),
+                                         ('admin', shared_team, True)]:
+            users[audience], _ = User.objects.get_or_create(
+                username=f'bench-api-{audience}',
+                defaults={'email': f'bench-api-{audience}@example.com', 'team': team, 'is_admin': is_admin,
+                          'password': '!'},
+            )
+        return users
+
+    def seed(self, counts, options):
+        FeedBenchmark(stdout=self.stdout, stderr=self.stderr).seed({
+            'posts': counts['posts'], 'users': counts['users'], 'teams': counts['teams'],
+            'batch_size': options['batch_size'],
+        })
+        users = list(User.objects.values_list('id', flat=True)[:counts['users']])
+        post_ids = list(Post.objects.values_list('id', flat=True)[:counts['posts']])
+        batch_size = options['batch_size']
+
+        missing = counts['comments'] - Comments.objects.count()
+        while missing > 0:
+            size = min(batch_size, missing)
+            Comments.objects.bulk_create([
+                Comments(post_id=random.choice(post_ids), user_id=random.choice(users), comment=sentence(12))
+                for _ in range(size)
+            ])
+            missing -= size
+
+        missing = counts['likes'] - Like.objects.count()
+        while missing > 0:
+            Like.objects.bulk_create([
+                Like(post_id=random.choice(post_ids), user_id=random.choice(users))
+                for _ in range(min(batch_size, missing))
+            ], ignore_conflicts=True)
+            remaining = counts['likes'] - Like.objects.count()
+            if remaining == missing:
+                # Every drawn (post, user) pair was already liked.
+                break
+            missing = remaining
+
+        call_command('reconcile_post_counts', stdout=self.stdout)
@@ -0,0 +1,128 @@
+"""In-process request and cache metrics, rendered in the Prometheus text format.
+
+Series are created once per (route, method) or cache name and then only
+updated in place, so recording a request costs a few list increments under
+a lock. Every worker process keeps its own registry; Prometheus aggregates
+the processes it scrapes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [count per bucket..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, label_values, value):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series.setdefault(label_values, [0] * (len(self.buckets) + 2))
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self.series.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, label_values, amount=1):
+        self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+ROUTE_LABELS = ('route', 'method')
+
+request_latency = Histogram(
+    'avanzablog_request_duration_seconds', 'Time spent serving the request.', LATENCY_BUCKETS, ROUTE_LABELS)
+request_queries = Histogram(
+    'avanzablog_request_db_queries', 'Database queries run by the request.', QUERY_BUCKETS, ROUTE_LABELS)
+request_db_time = Histogram(
+    'avanzablog_request_db_duration_seconds', 'Time the request spent in database queries.',
+    DB_TIME_BUCKETS, ROUTE_LABELS)
+response_size = Histogram(
+    'avanzablog_response_size_bytes', 'Size of the serialized response body.', SIZE_BUCKETS, ROUTE_LABELS)
+responses = Counter('avanzablog_responses_total', 'Responses by status class.', ROUTE_LABELS + ('status',))
+cache_requests = Counter('avanzablog_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result'))
+
+REGISTRY = [request_latency, request_queries, request_db_time, response_size, responses, cache_requests]
+_lock = threading.Lock()
+
+# [query count, seconds in queries] of the request being served, if any.
+current_request_db = ContextVar('current_request_db', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's totals."""
+    totals = current_request_db.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - start
+
+
+def record_request(route, method, status, duration, db_totals, size):
+    labels = (route, method)
+    with _lock:
+        request_latency.observe(labels, duration)
+        request_queries.observe(labels, db_totals[0])
+        request_db_time.observe(labels, db_totals[1])
+        if size is not None:
+            response_size.observe(labels, size)
+        responses.inc(labels + (f'{status // 100}xx',))
+
+
+def record_cache_lookup(cache, hit):
+    with _lock:
+        cache_requests.inc((cache, 'hit' if hit else 'miss'))
+
+
+def render():
+    with _lock:
+        lines = [line for metric in REGISTRY for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for metric in REGISTRY:
+            metric.series.clear()
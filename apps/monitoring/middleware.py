@@ -0,0 +1,53 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from . import metrics
+
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+class MetricsMiddleware:
+    """Records latency, database usage and response size of every request, labelled by route.
+
+    The route is the resolved URL name, so the number of series stays bounded
+    whatever paths clients send. Keep it first in MIDDLEWARE so the latency
+    covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start, db_totals, token = self.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request_db.reset(token)
+        self.end(request, response, start, db_totals)
+        return response
+
+    async def __acall__(self, request):
+        start, db_totals, token = self.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request_db.reset(token)
+        self.end(request, response, start, db_totals)
+        return response
+
+    def begin(self):
+        db_totals = [0, 0.0]
+        return time.perf_counter(), db_totals, metrics.current_request_db.set(db_totals)
+
+    def end(self, request, response, start, db_totals):
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.route) if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'OTHER'
+        size = None if response.streaming else len(response.content)
+        metrics.record_request(route, method, response.status_code, time.perf_counter() - start, db_totals, size)
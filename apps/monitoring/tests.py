@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from unittest import skipIf
+from django.db import connection
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from psycopg_pool import ConnectionPool
+from django.urls import reverse
+from rest_framework import status
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from apps.users.factories import UserFactory
+from apps.posts.factories import PostFactory
+from apps.comments.factories import CommentsFactory
+from . import metrics
+from .views import db_pool_stats
+
+class DbPoolViewTest(APITestCase):
+    def test_requires_staff(self):
+        self.client.force_login(UserFactory(is_admin=True))
+        response = self.client.get(reverse('db-pool'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @skipIf(connection.settings_dict['OPTIONS'].get('pool'), 'connection pooling is enabled')
+    def test_persistent_connection_stats(self):
+        self.client.force_authenticate(user=UserFactory(is_staff=True))
+        response = self.client.get(reverse('db-pool'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['pooling'])
+        self.assertEqual(response.data['conn_max_age'], connection.settings_dict['CONN_MAX_AGE'])
+        self.assertTrue(response.data['connected'])
+
+    def test_pool_stats(self):
+        settings_dict = {**connection.settings_dict, 'CONN_MAX_AGE': 0}
+        pool = ConnectionPool(kwargs=connection.get_connection_params(), min_size=1, max_size=1, open=True)
+        try:
+            pool.wait()
+            pooled = SimpleNamespace(settings_dict=settings_dict, pool=pool)
+            with pool.connection():
+                stats = db_pool_stats(pooled)
+                self.assertTrue(stats['pooling'])
+                self.assertEqual((stats['min_size'], stats['max_size']), (1, 1))
+                self.assertEqual(stats['in_use'], 1)
+            stats = db_pool_stats(pooled)
+            self.assertEqual(stats['in_use'], 0)
+            self.assertEqual(stats['idle'], 1)
+            self.assertEqual(stats['requests'], 1)
+        finally:
+            pool.close()
+
+def sample(text, name, **labels):
+    """Value of the series of metric name with exactly these labels, or None."""
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    for line in text.splitlines():
+        if line.startswith(f'{name}{{{wanted}}} '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_request_metrics_per_route(self):
+        PostFactory()
+        list_response = self.client.get(reverse('list-posts'))
+        self.client.get(reverse('list-posts'))
+        self.client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'})
+        text = self.scrape()
+
+        self.assertEqual(sample(text, 'avanzablog_request_duration_seconds_count', route='list-posts', method='GET'), 2)
+        self.assertEqual(sample(text, 'avanzablog_responses_total', route='list-posts', method='GET', status='2xx'), 2)
+        self.assertEqual(sample(text, 'avanzablog_responses_total', route='login', method='POST', status='4xx'), 1)
+        self.assertEqual(sample(text, 'avanzablog_response_size_bytes_sum', route='list-posts', method='GET'),
+                         2 * len(list_response.content))
+        self.assertGreater(sample(text, 'avanzablog_request_db_queries_sum', route='list-posts', method='GET'), 0)
+        self.assertGreater(sample(text, 'avanzablog_request_db_duration_seconds_sum', route='list-posts', method='GET'), 0)
+        self.assertEqual(sample(text, 'avanzablog_request_duration_seconds_bucket',
+                                route='list-posts', method='GET', le='+Inf'), 2)
+
+    def test_query_count_matches_request(self):
+        post = PostFactory()
+        queries = []
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            self.client.get(reverse('post-detail', args=[post.pk]))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'avanzablog_request_db_queries_sum', route='post-detail', method='GET'),
+                         len(queries))
+
+    async def test_async_reads_are_recorded(self):
+        await sync_to_async(PostFactory)()
+        response = await self.async_client.get(reverse('list-posts'))
+        self.assertEqual(response.status_code, 200)
+        text = await sync_to_async(self.scrape)()
+        self.assertEqual(sample(text, 'avanzablog_request_duration_seconds_count', route='list-posts', method='GET'), 1)
+        self.assertGreater(sample(text, 'avanzablog_request_db_queries_sum', route='list-posts', method='GET'), 0)
+
+    def test_unresolved_paths_share_one_series(self):
+        self.client.get('/no/such/path/')
+        self.client.get('/another/missing/path/')
+        text = self.scrape()
+        self.assertEqual(sample(text, 'avanzablog_responses_total', route='unmatched', method='GET', status='4xx'), 2)
+
+    @override_settings(PAGINATION_EXACT_COUNT_LIMIT=0)
+    def test_cache_counters(self):
+        cache.clear()
+        CommentsFactory()
+        self.client.force_login(UserFactory(is_admin=True))
+        self.client.get(reverse('comments-list'))
+        self.client.get(reverse('comments-list'))
+        self.client.get(reverse('list-posts'))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'avanzablog_cache_requests_total', cache='feed_count', result='miss'), 2)
+        self.assertEqual(sample(text, 'avanzablog_cache_requests_total', cache='feed_count', result='hit'), 1)
+        self.assertNotIn('cache="categories"', text)
+
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_staff_only_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 401)
+        self.client.force_login(UserFactory())
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(UserFactory(is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+class BenchmarkApiTest(TestCase):
+    def run_benchmark(self, *args):
+        call_command('benchmark_api', '--seed', '--posts', '30', '--users', '6', '--teams', '2', '--comments', '20',
+                     '--likes', '20', '--repeat', '2', '--warmup', '1', *args, stdout=StringIO())
+
+    def test_report_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, 'report.json')
+            self.run_benchmark('--output', report_path)
+            with open(report_path) as report_file:
+                report = json.load(report_file)
+
+            results = report['results']
+            self.assertEqual(set(results['posts.list']), {'anonymous', 'regular', 'team-member', 'admin'})
+            self.assertEqual(set(results['posts.create']), {'regular', 'team-member', 'admin'})
+            for audience, result in results['posts.detail'].items():
+                self.assertEqual(result['status'], 200, audience)
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertEqual(results['posts.create']['admin']['status'], 201)
+            # Writes are rolled back.
+            self.assertEqual(report['meta']['rows']['posts'], 30)
+
+            baseline_path = os.path.join(directory, 'baseline.json')
+            results['posts.list']['anonymous']['queries'] -= 1
+            with open(baseline_path, 'w') as baseline_file:
+                json.dump(report, baseline_file)
+            with self.assertRaisesRegex(CommandError, 'posts.list as anonymous: queries'):
+                self.run_benchmark('--baseline', baseline_path, '--threshold', '1000')
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from . import metrics
+
+def db_pool_stats(db_connection):
+    """Connection reuse settings and, when pooling, the pool's current usage."""
+    settings_dict = db_connection.settings_dict
+    pool = getattr(db_connection, 'pool', None)
+    if pool is None:
+        return {
+            'pooling': False,
+            'conn_max_age': settings_dict['CONN_MAX_AGE'],
+            'health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+            'connected': db_connection.connection is not None,
+        }
+
+    stats = pool.get_stats()
+    queued = stats.get('requests_queued', 0)
+    return {
+        'pooling': True,
+        'health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+        'min_size': stats['pool_min'],
+        'max_size': stats['pool_max'],
+        'size': stats['pool_size'],
+        'in_use': stats['pool_size'] - stats['pool_available'],
+        'idle': stats['pool_available'],
+        'waiting': stats['requests_waiting'],
+        'requests': stats.get('requests_num', 0),
+        'queued_requests': queued,
+        'wait_ms_total': stats.get('requests_wait_ms', 0),
+        'wait_ms_avg': stats.get('requests_wait_ms', 0) / queued if queued else 0,
+        'request_errors': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connect_ms_total': stats.get('connections_ms', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+        'bad_connections_returned': stats.get('returns_bad', 0),
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_view(request):
+    return Response(db_pool_stats(connection))
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape target for staff sessions, or ``Authorization: Bearer <METRICS_TOKEN>`` when that is set."""
+    has_token = settings.METRICS_TOKEN and request.headers.get('Authorization') == f'Bearer {settings.METRICS_TOKEN}'
+    if not has_token and not request.user.is_staff:
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,69 @@
+from .models import Post, ACCESS_READ, ACCESS_READ_EDIT
+from .utils import access_level
+
+ACCESS_FIELDS = ['id', 'author_id', 'author_team_id', 'public_access', 'authenticated_access', 'team_access', 'author_access']
+
+def _levels(request):
+    return request.__dict__.setdefault('_post_access_levels', {})
+
+def _post_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def remember_access_level(request, post):
+    """Computes the access level for an already loaded post and memoizes it on the request."""
+    levels = _levels(request)
+    if post.pk not in levels:
+        levels[post.pk] = access_level(request.user, post)
+    return levels[post.pk]
+
+def get_access_levels(request, post_ids):
+    """Maps each existing post in post_ids to request.user's access level.
+
+    Ids not yet seen in this request are loaded with a single primary-key
+    query that touches no other table; missing posts are remembered as None.
+    """
+    levels = _levels(request)
+    post_ids = [post_id for post_id in map(_post_id, post_ids) if post_id is not None]
+    missing = [post_id for post_id in post_ids if post_id not in levels]
+    if missing:
+        for post in Post.objects.filter(id__in=missing).only(*ACCESS_FIELDS):
+            levels[post.pk] = access_level(request.user, post)
+        for post_id in missing:
+            levels.setdefault(post_id, None)
+    return {post_id: levels[post_id] for post_id in post_ids if levels[post_id] is not None}
+
+async def aget_access_levels(request, post_ids):
+    """get_access_levels for async views; request.user must already be resolved."""
+    levels = _levels(request)
+    post_ids = [post_id for post_id in map(_post_id, post_ids) if post_id is not None]
+    missing = [post_id for post_id in post_ids if post_id not in levels]
+    if missing:
+        async for post in Post.objects.filter(id__in=missing).only(*ACCESS_FIELDS):
+            levels[post.pk] = access_level(request.user, post)
+        for post_id in missing:
+            levels.setdefault(post_id, None)
+    return {post_id: levels[post_id] for post_id in post_ids if levels[post_id] is not None}
+
+def get_access_level(request, post_id):
+    """Access level of request.user on post_id, or None when the post does not exist."""
+    return get_access_levels(request, [post_id]).get(_post_id(post_id))
+
+def post_exists(request, post_id):
+    return get_access_level(request, post_id) is not None
+
+def can_read_post(request, post_id):
+    level = get_access_level(request, post_id)
+    return level is not None and level >= ACCESS_READ
+
+async def acan_read_post(request, post_id):
+    level = (await aget_access_levels(request, [post_id])).get(_post_id(post_id))
+    return level is not None and level >= ACCESS_READ
+
+def can_edit_post(request, post_id):
+    return get_access_level(request, post_id) == ACCESS_READ_EDIT
+
+def readable_post_ids(request, post_ids):
+    return {post_id for post_id, level in get_access_levels(request, post_ids).items() if level >= ACCESS_READ}
@@ -0,0 +1,102 @@
+from asgiref.sync import sync_to_async
+from django.db.models import aprefetch_related_objects
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Post
+from .permissions import CanViewPost
+from .serializers import post_serializer
+from .utils import copy_viewer_flags, post_etag, post_list_etag, requested_fields, with_feed_relations, VERSION_FIELDS
+from .views import list_posts_view, PostDetailView
+
+class AsyncReadView(View):
+    """GET-only async counterpart of a DRF view, answering with the same JSON and status codes.
+
+    Served instead of the DRF views for reads under ASGI (see
+    Avanzablog.async_urls), so a worker can wait on many queries at once.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        # Wrapped in a DRF request so the helpers shared with the sync views
+        # find query_params and the already resolved user.
+        drf_request = Request(request)
+        drf_request.user = await request.auser()
+        try:
+            return await self.read(drf_request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(data, status=exc.status_code)
+
+    async def read(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def render(self, data, status=200):
+        return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder,
+                            json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+class AsyncFeedView(AsyncReadView):
+    """Paginated, filtered list read; subclasses provide the queryset."""
+    pagination_class = None
+    serializer_class = None
+    filter_backends = []
+    filterset_fields = []
+
+    async def get_queryset(self, request):
+        raise NotImplementedError
+
+    async def read(self, request, *args, **kwargs):
+        queryset = await self.get_queryset(request)
+        for backend in self.filter_backends:
+            # Filter validation may look rows up, which django-filter only does synchronously.
+            queryset = await sync_to_async(backend().filter_queryset)(request, queryset, self)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request)
+        data = self.serializer_class(page, many=True, context={'request': request}).data
+        return self.render(paginator.get_paginated_response(data).data)
+
+class AsyncListPostsView(AsyncReadView):
+    async def read(self, request):
+        sync_view = list_posts_view(request=request, kwargs={}, format_kwarg=None)
+        fields = requested_fields(request.query_params)
+        paginator = sync_view.pagination_class()
+        page = await paginator.apaginate_queryset(sync_view.get_queryset().only(*VERSION_FIELDS), request)
+        page_meta = paginator.get_paginated_response([]).data
+        etag = post_list_etag(page, page_meta, fields)
+
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            queryset = with_feed_relations(Post.objects, fields).filter(pk__in=[post.pk for post in page])
+            posts = {post.pk: post async for post in queryset.aiterator(chunk_size=max(len(page), 1))}
+            for post in page:
+                if post.pk in posts:
+                    copy_viewer_flags(post, posts[post.pk])
+            serializer = post_serializer([posts[post.pk] for post in page if post.pk in posts], many=True,
+                                         context={'request': request, 'fields': fields})
+            response = self.render(paginator.get_paginated_response(serializer.data).data)
+        response['ETag'] = etag
+        if page:
+            response['Last-Modified'] = http_date(max(post.updated_at for post in page).timestamp())
+        return response
+
+class AsyncPostDetailView(AsyncReadView):
+    async def read(self, request, pk):
+        sync_view = PostDetailView(request=request, kwargs={'pk': pk}, format_kwarg=None)
+        fields = requested_fields(request.query_params)
+        post = await sync_view.get_queryset().filter(pk=pk).afirst()
+        if post is None:
+            raise NotFound('No Post matches the given query.')
+        if not CanViewPost().has_object_permission(request, sync_view, post):
+            # As DRF's check_object_permissions does, e.g. for HEAD, which CanViewPost never grants.
+            raise PermissionDenied()
+
+        response = get_conditional_response(request._request, etag=post_etag(post, fields))
+        if response is None:
+            if fields is None or 'permissions' in fields:
+                await aprefetch_related_objects([post], 'permissions_set')
+            response = self.render(post_serializer(post, context={'request': request, 'fields': fields}).data)
+        return sync_view.add_validators(response, post, fields)
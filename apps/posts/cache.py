@@ -0,0 +1,41 @@
+from functools import partial
+from django.core.cache import cache
+from django.db import transaction
+
+VISIBILITY_VERSION_KEY = 'posts:visibility-version'
+
+def visibility_scopes(user):
+    """Version scopes whose posts user can read.
+
+    Anonymous users and admins are one class each. Everyone else reads their
+    own posts (author:<id>), their team's posts (team:<id>) and the posts
+    opened to every signed-in user (authenticated).
+    """
+    if not user.is_authenticated:
+        return ['anonymous']
+
+    if user.is_admin:
+        return ['admin']
+
+    return [f'author:{user.id}', f'team:{user.team_id}', 'authenticated']
+
+def visibility_version(user):
+    """Version token of the posts user can read; part of every cached feed count key.
+
+    Combines the global version, bumped by bulk changes, with the version of
+    each of the user's scopes, so a write only retires the classes it affects.
+    """
+    keys = [VISIBILITY_VERSION_KEY] + [f'{VISIBILITY_VERSION_KEY}:{scope}' for scope in visibility_scopes(user)]
+    versions = cache.get_many(keys)
+    return '.'.join(str(versions.get(key, 0)) for key in keys)
+
+def bump_visibility_version(*scopes):
+    """Invalidates the cached feed counts of the given scopes, or of every class when none are given."""
+    for key in [f'{VISIBILITY_VERSION_KEY}:{scope}' for scope in scopes] or [VISIBILITY_VERSION_KEY]:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+def bump_visibility_on_commit(*scopes):
+    # Bumped only once the write commits, so the new version is never paired
+    # with rows read before the change, and rollbacks keep the cache.
+    transaction.on_commit(partial(bump_visibility_version, *scopes))
@@ -0,0 +1,32 @@
+"""Process-wide registry of the permission categories.
+
+The four categories (Public, Authenticated, Team, Author) practically never
+change, so their name <-> id mapping is loaded once on first use and kept
+until a Categories row is saved or deleted in this process.
+"""
+
+_registry = None
+
+def _load():
+    global _registry
+    if _registry is None:
+        from .models import Categories
+        names = dict(Categories.objects.values_list('id', 'category_name'))
+        _registry = {
+            'by_id': names,
+            'by_name': {name: category_id for category_id, name in names.items()},
+        }
+    return _registry
+
+def invalidate_categories():
+    global _registry
+    _registry = None
+
+def category_id(name):
+    return _load()['by_name'].get(name)
+
+def category_name(category_id):
+    return _load()['by_id'].get(category_id)
+
+def category_ids():
+    return set(_load()['by_id'])
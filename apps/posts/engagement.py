@@ -0,0 +1,37 @@
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef, Subquery
+from apps.comments.models import Comments
+from apps.likes.models import Like
+from .models import Post
+
+def post_engagement(post_ids, likers=3):
+    """Like and comment totals, latest comment time and most recent likers of each post in post_ids.
+
+    One query covers every post: the totals come from the denormalized
+    counters, and the likers and latest comment are per-post subqueries that
+    read only the newest rows of the (post, -timestamp) indexes. Callers
+    filter post_ids by visibility first.
+    """
+    if not post_ids:
+        return []
+
+    latest_comment = Comments.objects.filter(post=OuterRef('pk')).order_by('-timestamp').values('timestamp')[:1]
+    posts = Post.objects.filter(pk__in=post_ids).annotate(latest_comment_at=Subquery(latest_comment))
+    if likers:
+        recent_likes = Like.objects.filter(post=OuterRef('pk')).order_by('-timestamp', '-id')
+        posts = posts.annotate(recent_likers=ArraySubquery(recent_likes.values('user__username')[:likers]))
+    rows = {
+        row['id']: row
+        for row in posts.values('id', 'like_count', 'comment_count', 'latest_comment_at',
+                                *(['recent_likers'] if likers else []))
+    }
+    return [
+        {
+            'post': post_id,
+            'like_count': rows[post_id]['like_count'],
+            'comment_count': rows[post_id]['comment_count'],
+            'latest_comment_at': rows[post_id]['latest_comment_at'],
+            'recent_likers': rows[post_id].get('recent_likers', []),
+        }
+        for post_id in post_ids if post_id in rows
+    ]
@@ -1,6 +1,7 @@
 import factory
 from factory.django import DjangoModelFactory
 from .models import Categories, Post, Permission
+from .categories import invalidate_categories
 from apps.users.factories import UserFactory
 
 class CategoriesFactory(DjangoModelFactory):
@@ -33,6 +34,7 @@ class PostFactory(DjangoModelFactory):
                 Categories(category_name='Team'),
                 Categories(category_name='Author'),
             ])
+            invalidate_categories()
             for category in categories:
                 Permission.objects.create(post=self, category=category, access='read')
 
@@ -0,0 +1,178 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch, Q
+
+from apps.posts.models import Categories, Permission, Post, ACCESS_LEVELS, VISIBILITY_FIELDS
+from apps.posts.utils import filter_permissions, get_accessible_posts
+from apps.users.models import Team, User
+
+ACCESS_OPTIONS = ['none', 'read', 'read_edit']
+# Seeded text draws from this vocabulary with Zipf-like weights, so search terms range from common to rare.
+WORDS = (
+    'django postgres index query cache team feed post comment like search rank author public '
+    'latency throughput vacuum planner replica backup migration schema trigger cursor pagination '
+    'benchmark profile memory thread pool socket release deploy rollback monitor alert metric '
+    'histogram queue worker batch stream partition shard lock deadlock snapshot checkpoint wal'
+).split() + [f'term{i}' for i in range(5_000)]
+WORD_WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+
+def sentence(length):
+    return ' '.join(random.choices(WORDS, WORD_WEIGHTS, k=length))
+
+
+def legacy_accessible_posts(user):
+    """The Permission-join implementation of get_accessible_posts, kept as the benchmark baseline."""
+    if not user.is_authenticated:
+        permission_filtered = filter_permissions('Public', ['read', 'read_edit'])
+        permissions_prefetch = Prefetch('permissions_set', queryset=permission_filtered)
+        return Post.objects.prefetch_related(permissions_prefetch).filter(
+            permissions_set__in=permission_filtered).distinct().order_by('-timestamp')
+
+    if user.is_admin:
+        return Post.objects.all().order_by('-timestamp')
+
+    permission_filtered = filter_permissions('Author', ['read', 'read_edit'])
+    author = Post.objects.filter(author=user, permissions_set__in=permission_filtered).distinct()
+
+    permission_filtered = filter_permissions('Team', ['read', 'read_edit'])
+    team_members = User.objects.filter(team=user.team).exclude(id=user.id)
+    team = Post.objects.filter(author__in=team_members, permissions_set__in=permission_filtered).distinct()
+
+    permission_filtered = filter_permissions('Authenticated', ['read', 'read_edit'])
+    authenticated = Post.objects.filter(permissions_set__in=permission_filtered).exclude(
+        Q(author=user) | Q(author__in=team_members)
+    ).distinct()
+    return (author | team | authenticated).order_by('-timestamp')
+
+
+class Command(BaseCommand):
+    help = 'Compares feed latency of the Permission-join query against the denormalized post columns, including team feeds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000, help='Number of posts to benchmark against.')
+        parser.add_argument('--users', type=int, default=1_000, help='Number of authors to seed.')
+        parser.add_argument('--teams', type=int, default=100, help='Number of teams to seed.')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per query.')
+        parser.add_argument('--seed', action='store_true', help='Seed missing posts before benchmarking.')
+        parser.add_argument('--team-sizes', type=int, nargs='*', default=[10, 10_000],
+                            help='Also benchmark the feed of a member of a team with this many members.')
+        parser.add_argument('--team-posts', type=int, default=1_000, help='Team-visible posts seeded per benchmarked team.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options)
+
+        member = User.objects.filter(is_admin=False).order_by('id').first()
+        admin = User.objects.filter(is_admin=True).order_by('id').first()
+        audiences = [('anonymous', AnonymousUser())]
+        if member:
+            audiences.append(('member', member))
+        if admin:
+            audiences.append(('admin', admin))
+        for size in options['team_sizes']:
+            team = self.seed_team(size, options) if options['seed'] else Team.objects.filter(tname=f'bench-team-of-{size}').first()
+            team_member = User.objects.filter(team=team, is_admin=False).order_by('id').first() if team else None
+            if team_member:
+                audiences.append((f'team-{size}', team_member))
+
+        self.stdout.write(f'{Post.objects.count()} posts')
+        self.stdout.write(f"{'audience':<12}{'query':<8}{'legacy ms':>12}{'columns ms':>12}{'speedup':>10}")
+        for label, user in audiences:
+            for query, run in [('page', self.first_page), ('count', self.count)]:
+                legacy = self.measure(lambda: run(legacy_accessible_posts(user)), options['repeat'])
+                columns = self.measure(lambda: run(get_accessible_posts(user)), options['repeat'])
+                speedup = legacy / columns if columns else float('inf')
+                self.stdout.write(f'{label:<12}{query:<8}{legacy:>12.2f}{columns:>12.2f}{speedup:>9.1f}x')
+
+    def first_page(self, queryset):
+        return list(queryset[:10])
+
+    def count(self, queryset):
+        return queryset.count()
+
+    def measure(self, run, repeat):
+        run()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, options):
+        categories = {
+            name: Categories.objects.get_or_create(category_name=name)[0]
+            for name in VISIBILITY_FIELDS
+        }
+        teams = list(Team.objects.all()[:options['teams']])
+        missing_teams = options['teams'] - len(teams)
+        if missing_teams > 0:
+            offset = Team.objects.count()
+            teams += Team.objects.bulk_create([
+                Team(tname=f'bench-team-{offset + i}') for i in range(missing_teams)
+            ])
+
+        users = list(User.objects.all()[:options['users']])
+        missing_users = options['users'] - len(users)
+        if missing_users > 0:
+            offset = User.objects.count()
+            users += User.objects.bulk_create([
+                User(username=f'bench-user-{offset + i}', email=f'bench-user-{offset + i}@example.com',
+                     team=random.choice(teams), is_admin=(i == 0), password='!')
+                for i in range(missing_users)
+            ], batch_size=options['batch_size'])
+
+        missing_posts = options['posts'] - Post.objects.count()
+        batch_size = options['batch_size']
+        while missing_posts > 0:
+            size = min(batch_size, missing_posts)
+            grants = [{name: random.choice(ACCESS_OPTIONS) for name in VISIBILITY_FIELDS} for _ in range(size)]
+            self.create_posts(users, grants, categories, batch_size)
+            missing_posts -= size
+            self.stdout.write(f'seeded {size} posts, {max(missing_posts, 0)} to go')
+
+    def seed_team(self, size, options):
+        team, _ = Team.objects.get_or_create(tname=f'bench-team-of-{size}')
+        members = list(User.objects.filter(team=team))
+        if len(members) < size:
+            members += User.objects.bulk_create([
+                User(username=f'bench-team-of-{size}-{i}', email=f'bench-team-of-{size}-{i}@example.com',
+                     team=team, password='!')
+                for i in range(len(members), size)
+            ], batch_size=options['batch_size'])
+            categories = {
+                name: Categories.objects.get_or_create(category_name=name)[0]
+                for name in VISIBILITY_FIELDS
+            }
+            grants = [
+                {'Public': 'none', 'Authenticated': 'none', 'Team': 'read', 'Author': 'read'}
+                for _ in range(options['team_posts'])
+            ]
+            self.create_posts(members, grants, categories, options['batch_size'])
+        return team
+
+    def create_posts(self, authors, grants, categories, batch_size):
+        posts = []
+        for access in grants:
+            author = random.choice(authors)
+            content = sentence(40)
+            posts.append(Post(
+                author=author,
+                author_team_id=author.team_id,
+                title=sentence(5).capitalize(),
+                content=content,
+                excerpt=content[:200],
+                **{field: ACCESS_LEVELS[access[name]] for name, field in VISIBILITY_FIELDS.items()},
+            ))
+        posts = Post.objects.bulk_create(posts, batch_size=batch_size)
+        Permission.objects.bulk_create([
+            Permission(post=post, category=categories[name], access=access[name])
+            for post, access in zip(posts, grants)
+            for name in VISIBILITY_FIELDS
+        ], batch_size=batch_size)
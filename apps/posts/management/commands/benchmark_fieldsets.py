@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import force_authenticate
+
+from apps.posts.models import Post
+from apps.posts.views import list_posts_view, PostDetailView
+from apps.users.models import User
+
+MODES = [
+    ('full', {}),
+    ('summary', {'fields': 'id,author,title,excerpt,timestamp'}),
+    ('no-content', {'exclude': 'content'}),
+    ('no-permissions', {'exclude': 'permissions'}),
+    ('ids', {'fields': 'id'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compares response size, latency and queries of the posts feed and detail for each ?fields=/?exclude= mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per mode.')
+        parser.add_argument('--user', help='Username to request as; anonymous by default.')
+
+    def handle(self, *args, **options):
+        user = User.objects.get(username=options['user']) if options['user'] else AnonymousUser()
+        post = Post.objects.order_by('-timestamp').first()
+        endpoints = [('list', list_posts_view.as_view(), '/post/', {})]
+        if post:
+            endpoints.append(('detail', PostDetailView.as_view(), f'/post/{post.pk}/', {'pk': post.pk}))
+
+        self.stdout.write(f"{'endpoint':<10}{'mode':<16}{'bytes':>10}{'median ms':>12}{'queries':>9}")
+        # RequestFactory's host is not in ALLOWED_HOSTS outside the test runner, and page links need it.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for endpoint, view, path, kwargs in endpoints:
+                for mode, params in MODES:
+                    def run():
+                        request = RequestFactory().get(path, params)
+                        force_authenticate(request, user=user)
+                        return view(request, **kwargs).render()
+
+                    response = run()
+                    with CaptureQueriesContext(connection) as queries:
+                        run()
+                    query_count = len(queries)
+                    timings = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        run()
+                        timings.append((time.perf_counter() - start) * 1000)
+                    self.stdout.write(
+                        f'{endpoint:<10}{mode:<16}{len(response.content):>10}'
+                        f'{statistics.median(timings):>12.2f}{query_count:>9}'
+                    )
@@ -0,0 +1,52 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from apps.posts.management.commands.benchmark_feed import WORDS
+from apps.posts.models import Post
+from apps.posts.search import autocomplete_titles, search_posts
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Times ranked full-text search and title autocomplete per audience. '
+            'Seed a large dataset first with benchmark_feed --seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per query.')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--terms', nargs='*',
+                            default=[WORDS[0], WORDS[20], WORDS[500], WORDS[-1], f'{WORDS[1]} {WORDS[-2]}', f'"{WORDS[2]} {WORDS[3]}"'],
+                            help='Search queries, in websearch syntax.')
+        parser.add_argument('--prefixes', nargs='*', default=[WORDS[0][:3], WORDS[10][:4], 'term49'])
+
+    def handle(self, *args, **options):
+        audiences = [('anonymous', AnonymousUser())]
+        member = User.objects.filter(is_admin=False).order_by('id').first()
+        admin = User.objects.filter(is_admin=True).order_by('id').first()
+        if member:
+            audiences.append(('member', member))
+        if admin:
+            audiences.append(('admin', admin))
+
+        page_size = options['page_size']
+        self.stdout.write(f'{Post.objects.count()} posts')
+        self.stdout.write(f"{'audience':<12}{'kind':<14}{'query':<24}{'rows':>6}{'median ms':>12}{'p95 ms':>10}")
+        for label, user in audiences:
+            runs = [('search', term, lambda term=term: list(search_posts(user, term)[:page_size]))
+                    for term in options['terms']]
+            runs += [('autocomplete', prefix, lambda prefix=prefix: list(autocomplete_titles(user, prefix)))
+                     for prefix in options['prefixes']]
+            for kind, query, run in runs:
+                rows = len(run())
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - start) * 1000)
+                p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                self.stdout.write(
+                    f'{label:<12}{kind:<14}{query:<24}{rows:>6}{statistics.median(timings):>12.2f}{p95:>10.2f}'
+                )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from apps.comments.models import Comments
+from apps.likes.models import Like
+from apps.posts.models import Post
+
+
+def count_of(model):
+    counts = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Post.like_count and Post.comment_count and fixes any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Posts checked per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            with transaction.atomic():
+                drifted = Post.objects.filter(id__in=ids).select_for_update().annotate(
+                    actual_likes=count_of(Like),
+                    actual_comments=count_of(Comments),
+                ).filter(~Q(like_count=F('actual_likes')) | ~Q(comment_count=F('actual_comments')))
+                for post in drifted.values('id', 'like_count', 'actual_likes', 'comment_count', 'actual_comments'):
+                    fixed += 1
+                    self.stdout.write(
+                        f"post {post['id']}: likes {post['like_count']} -> {post['actual_likes']}, "
+                        f"comments {post['comment_count']} -> {post['actual_comments']}"
+                    )
+                    if not options['dry_run']:
+                        Post.objects.filter(id=post['id']).update(
+                            like_count=post['actual_likes'], comment_count=post['actual_comments'])
+
+        action = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'checked {checked} posts, {action} {fixed}'))
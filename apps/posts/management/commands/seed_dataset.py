@@ -0,0 +1,253 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from apps.comments.models import Comments
+from apps.likes.models import Like
+from apps.posts.cache import bump_visibility_version
+from apps.posts.categories import invalidate_categories
+from apps.posts.management.commands.benchmark_feed import WORDS, WORD_WEIGHTS
+from apps.posts.models import Categories, Permission, Post, ACCESS_LEVELS, VISIBILITY_FIELDS
+from apps.users.models import Team, User
+
+WORD_CUM_WEIGHTS = list(accumulate(WORD_WEIGHTS))
+# How often each access level is granted per category.
+ACCESS_WEIGHTS = {
+    'Public': {'none': 4, 'read': 5, 'read_edit': 1},
+    'Authenticated': {'none': 2, 'read': 6, 'read_edit': 2},
+    'Team': {'none': 1, 'read': 5, 'read_edit': 4},
+    'Author': {'none': 0, 'read': 1, 'read_edit': 9},
+}
+
+# Set in each worker process by init_worker.
+_worker = {}
+
+
+def init_worker(options):
+    if not apps.ready:
+        django.setup()
+    _worker.clear()
+    _worker.update(options)
+
+
+def pareto_weights(name, count):
+    """Cumulative weights of count items whose popularity follows a Pareto distribution.
+
+    Seeded from --random-seed and computed once per process, so every
+    worker draws from the same distribution.
+    """
+    key = f'{name}_weights'
+    if key not in _worker:
+        rng = random.Random(f"{_worker['random_seed']}-{name}")
+        _worker[key] = list(accumulate(rng.paretovariate(_worker['alpha']) for _ in range(count)))
+    return _worker[key]
+
+
+def scaled_pareto(rng, mean, alpha):
+    """A Pareto-distributed count with the given mean."""
+    return int(rng.paretovariate(alpha) * mean * (alpha - 1) / alpha)
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choices(WORDS, cum_weights=WORD_CUM_WEIGHTS, k=length))
+
+
+def copy_rows(model, fields, rows):
+    """Streams rows into model's table with COPY; returns how many were written."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    written = 0
+    with connection.cursor() as cursor:
+        with cursor.copy(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+                written += 1
+    return written
+
+
+def seed_users(first_id, count, seed):
+    """Writes users first_id.. first_id + count - 1, spread over the teams with power-law sizes."""
+    rng = random.Random(seed)
+    team_ids = _worker['team_ids']
+    team_weights = pareto_weights('team', len(team_ids))
+    password = _worker['password']
+    admin_ratio = _worker['admin_ratio']
+    now = datetime.now(timezone.utc)
+    teams = rng.choices(team_ids, cum_weights=team_weights, k=count)
+    with transaction.atomic():
+        set_fast_commit()
+        return copy_rows(
+            User, ['id', 'username', 'email', 'password', 'is_admin', 'is_staff', 'is_superuser', 'is_active',
+                   'team', 'last_login'],
+            ((user_id, f'seed-user-{user_id}', f'seed-user-{user_id}@example.com', password,
+              rng.random() < admin_ratio, False, False, True, team, now)
+             for user_id, team in zip(range(first_id, first_id + count), teams)),
+        )
+
+
+def seed_posts(first_id, count, seed):
+    """Writes posts first_id.. first_id + count - 1 with their permissions, likes and comments.
+
+    Authors, likers and commenters are drawn with the same per-user
+    power-law activity, and the number of likes and comments per post
+    follows a Pareto distribution, so a few users and posts get most of the
+    traffic. The denormalized counters and visibility columns are written
+    with the post, already consistent with the rows written after it.
+    """
+    rng = random.Random(seed)
+    user_ids, user_teams = _worker['user_ids'], _worker['user_teams']
+    user_weights = pareto_weights('user', len(user_ids))
+    categories = _worker['categories']
+    alpha = _worker['alpha']
+    likes_per_post, comments_per_post = _worker['likes_per_post'], _worker['comments_per_post']
+    now = datetime.now(timezone.utc)
+    span = _worker['days'] * 86400
+
+    posts, permissions, likes, comments = [], [], [], []
+    authors = rng.choices(range(len(user_ids)), cum_weights=user_weights, k=count)
+    for post_id, author in zip(range(first_id, first_id + count), authors):
+        timestamp = now - timedelta(seconds=rng.random() * span)
+        grants = {
+            name: rng.choices(list(weights), list(weights.values()))[0]
+            for name, weights in ACCESS_WEIGHTS.items()
+        }
+        likers = set(rng.choices(user_ids, cum_weights=user_weights,
+                                 k=min(scaled_pareto(rng, likes_per_post, alpha), len(user_ids))))
+        comment_count = scaled_pareto(rng, comments_per_post, alpha)
+        content = sentence(rng, rng.randint(20, 120))[:1000]
+        posts.append((
+            post_id, user_ids[author], user_teams[author], sentence(rng, rng.randint(3, 10))[:100].capitalize(),
+            content, content[:200], timestamp, timestamp, len(likers), comment_count,
+            *(ACCESS_LEVELS[grants[name]] for name in VISIBILITY_FIELDS),
+        ))
+        permissions.extend((post_id, categories[name], access) for name, access in grants.items())
+
+        age = (now - timestamp).total_seconds()
+        likes.extend((post_id, user_id, timestamp + timedelta(seconds=rng.random() * age)) for user_id in likers)
+        comments.extend(
+            (post_id, user_id, sentence(rng, rng.randint(3, 30))[:200],
+             timestamp + timedelta(seconds=rng.random() * age))
+            for user_id in rng.choices(user_ids, cum_weights=user_weights, k=comment_count)
+        )
+
+    with transaction.atomic():
+        set_fast_commit()
+        written = copy_rows(Post, ['id', 'author', 'author_team', 'title', 'content', 'excerpt', 'timestamp',
+                                   'updated_at', 'like_count', 'comment_count', *VISIBILITY_FIELDS.values()], posts)
+        written += copy_rows(Permission, ['post', 'category', 'access'], permissions)
+        written += copy_rows(Like, ['post', 'user', 'timestamp'], likes)
+        written += copy_rows(Comments, ['post', 'user', 'comment', 'timestamp'], comments)
+    return written
+
+
+def set_fast_commit():
+    # Losing a generated chunk on a crash is fine; not waiting for the WAL flush is a large speedup.
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL synchronous_commit TO OFF')
+
+
+class Command(BaseCommand):
+    help = ('Generates teams, users, posts, permissions, likes and comments with power-law distributions, '
+            'streamed with COPY in chunks across a process pool. Run it against an otherwise idle database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=500)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--likes-per-post', type=float, default=10, help='Mean likes per post.')
+        parser.add_argument('--comments-per-post', type=float, default=3, help='Mean comments per post.')
+        parser.add_argument('--alpha', type=float, default=1.5,
+                            help='Pareto shape of user activity, team sizes and post popularity (> 1).')
+        parser.add_argument('--admin-ratio', type=float, default=0.01, help='Share of users who are admins.')
+        parser.add_argument('--days', type=int, default=365, help='Posts are spread over this many past days.')
+        parser.add_argument('--password', default='password', help='Password of every generated user.')
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Posts or users written per task.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 0 writes everything from this process.')
+        parser.add_argument('--random-seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Hashing is deliberately slow, so every generated user shares one hash.
+        worker = {
+            'alpha': options['alpha'],
+            'random_seed': options['random_seed'],
+            'password': make_password(options['password']),
+            'admin_ratio': options['admin_ratio'],
+            'likes_per_post': options['likes_per_post'],
+            'comments_per_post': options['comments_per_post'],
+            'days': options['days'],
+        }
+
+        categories = {name: Categories.objects.get_or_create(category_name=name)[0].pk for name in VISIBILITY_FIELDS}
+        invalidate_categories()
+        first_team = next_id(Team)
+        Team.objects.bulk_create([
+            Team(id=team_id, tname=f'seed-team-{team_id}')
+            for team_id in range(first_team, first_team + options['teams'])
+        ], batch_size=10_000)
+        worker['team_ids'] = list(Team.objects.order_by('id').values_list('id', flat=True))
+        self.stdout.write(f"{options['teams']} teams")
+
+        first_user = next_id(User)
+        written = self.run(seed_users, first_user, options['users'], worker, options)
+        self.stdout.write(f'{written} users in {time.perf_counter() - started:.1f}s')
+
+        users = list(User.objects.order_by('id').values_list('id', 'team_id'))
+        worker.update(user_ids=[user_id for user_id, _ in users], user_teams=[team for _, team in users],
+                      categories=categories)
+        written = self.run(seed_posts, next_id(Post), options['posts'], worker, options)
+        self.stdout.write(f'{written} posts, permissions, likes and comments in {time.perf_counter() - started:.1f}s')
+
+        with connection.cursor() as cursor:
+            for model in [Team, User, Post]:
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT MAX(id) FROM {}))".format(
+                        connection.ops.quote_name(model._meta.db_table)),
+                    [model._meta.db_table],
+                )
+            for model in [Team, User, Post, Permission, Like, Comments]:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        bump_visibility_version()
+        self.stdout.write(f'done in {time.perf_counter() - started:.1f}s')
+
+    def run(self, task, first_id, count, worker, options):
+        """Runs task over [first_id, first_id + count) in chunks; returns the rows written."""
+        chunk_size = options['chunk_size']
+        chunks = [
+            (start, min(chunk_size, first_id + count - start), options['random_seed'] * 1_000_003 + start)
+            for start in range(first_id, first_id + count, chunk_size)
+        ]
+        if not chunks:
+            return 0
+        if not options['workers']:
+            init_worker(worker)
+            return sum(task(*chunk) for chunk in chunks)
+
+        # Forked workers must open their own connections, and a pool's
+        # connections and threads do not survive the fork.
+        connections.close_all()
+        for db_connection in connections.all():
+            if db_connection.settings_dict['OPTIONS'].get('pool'):
+                db_connection.close_pool()
+        written = 0
+        with ProcessPoolExecutor(options['workers'], initializer=init_worker, initargs=(worker,)) as pool:
+            for done, rows in enumerate(pool.map(task, *zip(*chunks)), 1):
+                written += rows
+                if done % 10 == 0 or done == len(chunks):
+                    self.stdout.write(f'  {task.__name__}: {done}/{len(chunks)} chunks, {written} rows')
+        return written
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_alter_permission_post'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='authenticated_access',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'None'), (1, 'Read'), (2, 'Read & Edit')], default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='author_access',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'None'), (1, 'Read'), (2, 'Read & Edit')], default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='public_access',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'None'), (1, 'Read'), (2, 'Read & Edit')], default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='team_access',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'None'), (1, 'Read'), (2, 'Read & Edit')], default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('public_access__gte', 1)), fields=['-timestamp'], name='post_public_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('authenticated_access__gte', 1)), fields=['-timestamp'], name='post_auth_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-timestamp'], name='post_author_feed_idx'),
+        ),
+    ]
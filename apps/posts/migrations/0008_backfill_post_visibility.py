@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Case, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+ACCESS_LEVELS = {
+    'none': 0,
+    'read': 1,
+    'read_edit': 2,
+}
+
+VISIBILITY_FIELDS = {
+    'Public': 'public_access',
+    'Authenticated': 'authenticated_access',
+    'Team': 'team_access',
+    'Author': 'author_access',
+}
+
+
+def backfill_visibility(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Permission = apps.get_model('posts', 'Permission')
+
+    levels = {}
+    for category_name, field in VISIBILITY_FIELDS.items():
+        access = Permission.objects.filter(
+            post=OuterRef('pk'), category__category_name=category_name
+        ).annotate(
+            level=Case(
+                *[When(access=access, then=Value(level)) for access, level in ACCESS_LEVELS.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).values('level')[:1]
+        levels[field] = Coalesce(Subquery(access), Value(0))
+    Post.objects.update(**levels)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_visibility_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
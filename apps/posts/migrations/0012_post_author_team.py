@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_author_team(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model('users', 'User')
+    Post.objects.update(author_team=Subquery(User.objects.filter(pk=OuterRef('author')).values('team')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated_at'),
+        ('users', '0003_alter_user_team'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='author_team',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.SET_DEFAULT, to='users.team'),
+        ),
+        migrations.RunPython(backfill_author_team, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='author_team',
+            field=models.ForeignKey(default=1, editable=False, on_delete=django.db.models.deletion.SET_DEFAULT, to='users.team'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author_team', '-timestamp'], name='post_team_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:08
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so the hot tables stay writable while the indexes build.
+    atomic = False
+
+    dependencies = [
+        ('posts', '0012_post_author_team'),
+        ('users', '0003_alter_user_team'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='permission',
+            index=models.Index(fields=['category', 'access', 'post'], name='permission_category_access_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='permission',
+            index=models.Index(fields=['post', 'category'], name='permission_post_category_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['-timestamp', '-id'], name='post_feed_idx'),
+        ),
+    ]
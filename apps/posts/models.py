@@ -1,5 +1,33 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
-from apps.users.models import User
+from django.db.models.functions import Cast, Upper
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.users.models import Team, User
+from .cache import bump_visibility_on_commit
+from .categories import category_name, invalidate_categories
+
+# Text search configuration baked into the stored search vectors; changing it needs a migration.
+SEARCH_CONFIG = 'english'
+
+ACCESS_NONE = 0
+ACCESS_READ = 1
+ACCESS_READ_EDIT = 2
+
+ACCESS_LEVELS = {
+    'none': ACCESS_NONE,
+    'read': ACCESS_READ,
+    'read_edit': ACCESS_READ_EDIT,
+}
+
+VISIBILITY_FIELDS = {
+    'Public': 'public_access',
+    'Authenticated': 'authenticated_access',
+    'Team': 'team_access',
+    'Author': 'author_access',
+}
 
 class Categories(models.Model):
     category_name = models.CharField(max_length=20)
@@ -11,18 +39,100 @@ class Categories(models.Model):
         verbose_name_plural = 'Categories'
 
 class Post(models.Model):
+    ACCESS_CHOICES = [
+        (ACCESS_NONE, 'None'),
+        (ACCESS_READ, 'Read'),
+        (ACCESS_READ_EDIT, 'Read & Edit'),
+    ]
     author = models.ForeignKey(User, on_delete=models.CASCADE, null=False, blank=False)
+    # Copy of author.team taken at write time; follows the author through team changes.
+    author_team = models.ForeignKey(Team, on_delete=models.SET_DEFAULT, default=1, editable=False)
     title = models.CharField(max_length=100, blank=False)
     content = models.TextField(max_length=1000, blank=False)
     excerpt = models.TextField(max_length=200, blank=False)
     timestamp = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     permissionsPost = models.ManyToManyField(Categories, through = 'Permission', related_name = 'permissions_post')
+    # Denormalized copy of the Permission rows, kept in sync by sync_visibility.
+    public_access = models.PositiveSmallIntegerField(choices=ACCESS_CHOICES, default=ACCESS_NONE, editable=False)
+    authenticated_access = models.PositiveSmallIntegerField(choices=ACCESS_CHOICES, default=ACCESS_NONE, editable=False)
+    team_access = models.PositiveSmallIntegerField(choices=ACCESS_CHOICES, default=ACCESS_NONE, editable=False)
+    author_access = models.PositiveSmallIntegerField(choices=ACCESS_CHOICES, default=ACCESS_NONE, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by PostgreSQL on every insert and update of title or content.
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+                   SearchVector('content', weight='B', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp'], name='post_public_feed_idx',
+                         condition=models.Q(public_access__gte=ACCESS_READ)),
+            models.Index(fields=['-timestamp'], name='post_auth_feed_idx',
+                         condition=models.Q(authenticated_access__gte=ACCESS_READ)),
+            models.Index(fields=['author', '-timestamp'], name='post_author_feed_idx'),
+            models.Index(fields=['author_team', '-timestamp'], name='post_team_feed_idx'),
+            models.Index(fields=['-timestamp', '-id'], name='post_feed_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_idx'),
+            # Serves title__istartswith, which compiles to UPPER(title::text) LIKE 'PREFIX%'.
+            models.Index(OpClass(Upper(Cast('title', models.TextField())), name='text_pattern_ops'),
+                         name='post_title_prefix_idx'),
+        ]
+    
+    # Columns maintained with queryset updates; a plain save of a stale instance must not overwrite them.
+    DERIVED_FIELDS = list(VISIBILITY_FIELDS.values()) + ['like_count', 'comment_count', 'author_team']
+
     def save(self, *args, **kwargs):
         if not self.excerpt:
             self.excerpt = self.content[:200]
+        if self._state.adding:
+            self.author_team_id = self.author.team_id
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name not in self.DERIVED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    def set_visibility(self, permissions):
+        """Set the access columns from (category_id, access) pairs without saving."""
+        levels = dict.fromkeys(VISIBILITY_FIELDS.values(), ACCESS_NONE)
+        for category_id, access in permissions:
+            field = VISIBILITY_FIELDS.get(category_name(category_id))
+            if field:
+                levels[field] = ACCESS_LEVELS.get(access, ACCESS_NONE)
+        for field, level in levels.items():
+            setattr(self, field, level)
+        return levels
+
+    def visibility_scopes(self, levels=None):
+        """Visibility version scopes of the audiences that levels, by default the current columns, let read this post."""
+        if levels is None:
+            levels = {field: getattr(self, field) for field in VISIBILITY_FIELDS.values()}
+        audiences = {
+            'public_access': 'anonymous',
+            'authenticated_access': 'authenticated',
+            'team_access': f'team:{self.author_team_id}',
+            'author_access': f'author:{self.author_id}',
+        }
+        return {audiences[field] for field, level in levels.items() if level >= ACCESS_READ}
+
+    def sync_visibility(self):
+        current = Post.objects.filter(pk=self.pk).only('author', 'author_team', *VISIBILITY_FIELDS.values()).first()
+        if current is None:
+            return
+        before = current.visibility_scopes()
+        permissions = Permission.objects.filter(post_id=self.pk).values_list('category_id', 'access')
+        levels = self.set_visibility(permissions)
+        Post.objects.filter(pk=self.pk).update(updated_at=timezone.now(), **levels)
+        changed = before ^ current.visibility_scopes(levels)
+        if changed:
+            bump_visibility_on_commit(*changed)
+
     def __str__(self):
         return self.title
     
@@ -35,6 +145,49 @@ class Permission(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='permissions_set') 
     category = models.ForeignKey(Categories, on_delete=models.CASCADE, default=1)
     access = models.CharField(max_length=20, choices=OPTIONS)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'access', 'post'], name='permission_category_access_idx'),
+            models.Index(fields=['post', 'category'], name='permission_post_category_idx'),
+        ]
     
- 
- 
\ No newline at end of file
+@receiver(post_save, sender=Categories)
+@receiver(post_delete, sender=Categories)
+def categories_changed(sender, instance: Categories, **kwargs):
+    invalidate_categories()
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def sync_post_visibility(sender, instance: Permission, **kwargs):
+    if isinstance(kwargs.get('origin'), Post):
+        return
+    Post(pk=instance.post_id).sync_visibility()
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance: Post, created, **kwargs):
+    if created:
+        bump_visibility_on_commit('admin', *instance.visibility_scopes())
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance: Post, **kwargs):
+    bump_visibility_on_commit('admin', *instance.visibility_scopes())
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance: Team, **kwargs):
+    # Its users and their posts fall back to the default team without signals.
+    bump_visibility_on_commit()
+
+@receiver(post_save, sender=User)
+def user_team_changed(sender, instance: User, created, update_fields=None, **kwargs):
+    if created:
+        instance._loaded_team_id = instance.team_id
+        return
+    if update_fields is not None and 'team' not in update_fields and 'team_id' not in update_fields:
+        return
+    loaded_team_id = getattr(instance, '_loaded_team_id', None)
+    if loaded_team_id != instance.team_id:
+        Post.objects.filter(author=instance).update(author_team_id=instance.team_id)
+        bump_visibility_on_commit(f'team:{loaded_team_id}', f'team:{instance.team_id}')
+    instance._loaded_team_id = instance.team_id
+
@@ -1,15 +1,254 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from apps.monitoring.metrics import record_cache_lookup
+from .cache import visibility_version
+from .utils import visibility_class
 
-class PostsPagination(PageNumberPagination):
-    page_size = 10
+def estimate_count(queryset):
+    """Row estimate from the PostgreSQL planner, or None when it is unavailable."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+class CountStrategyPaginator(DjangoPaginator):
+    """Paginator whose count gets cheaper as the result grows.
+
+    Results up to ``PAGINATION_EXACT_COUNT_LIMIT`` rows are counted exactly
+    with a bounded query. Larger results are served from the cache under
+    ``cache_key``, and on a miss they are counted exactly, or estimated by the
+    planner once the estimate passes ``PAGINATION_ESTIMATED_COUNT_THRESHOLD``.
+    ``approximate`` is set whenever the count did not come from an exact
+    count on this request.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        limit = settings.PAGINATION_EXACT_COUNT_LIMIT
+        bounded = self.object_list[:limit + 1].count()
+        if bounded <= limit:
+            return bounded
+
+        if self.cache_key:
+            cached = cache.get(self.cache_key)
+            record_cache_lookup('feed_count', cached is not None)
+            if cached is not None:
+                self.approximate = True
+                return cached
+
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD:
+            count = estimate
+            self.approximate = True
+        else:
+            count = self.object_list.count()
+
+        if self.cache_key:
+            cache.set(self.cache_key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+        return count
+
+    async def acount(self):
+        """Computes count like the property does, with async queries, and caches it on the instance."""
+        if 'count' in self.__dict__:
+            return self.count
+        limit = settings.PAGINATION_EXACT_COUNT_LIMIT
+        count = await self.object_list[:limit + 1].acount()
+        if count > limit:
+            cached = None
+            if self.cache_key:
+                cached = await cache.aget(self.cache_key)
+                record_cache_lookup('feed_count', cached is not None)
+            if cached is not None:
+                self.approximate = True
+                count = cached
+            else:
+                estimate = await sync_to_async(estimate_count)(self.object_list)
+                if estimate is not None and estimate > settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD:
+                    count = estimate
+                    self.approximate = True
+                else:
+                    count = await self.object_list.acount()
+                if self.cache_key:
+                    await cache.aset(self.cache_key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+        self.__dict__['count'] = count
+        return count
+
+class FeedPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset mode.
+
+    Page counts go through CountStrategyPaginator, so large results report
+    a cached or estimated ``total_count`` flagged by ``count_is_approximate``.
+    Clients ask for the keyset mode with ``?pagination=cursor`` and follow the
+    returned cursors. Pages are keyed on ``(timestamp, id)`` so they cost the
+    same at any depth and no ``COUNT(*)`` is run.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    # Keyset ordering is (-cursor_field, -id); cursor_only skips page numbers entirely.
+    cursor_field = 'timestamp'
+    cursor_only = False
+    invalid_cursor_message = 'Invalid cursor'
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountStrategyPaginator(queryset, page_size, cache_key=self.get_count_cache_key())
+
+    def get_count_cache_key(self):
+        filters = sorted(
+            (key, value) for key, value in self.request.query_params.lists()
+            if key not in (self.page_query_param, self.page_size_query_param)
+        )
+        digest = hashlib.md5(json.dumps([self.request.path, filters]).encode()).hexdigest()
+        # The user's visibility version retires the count as soon as a post can have entered or left their view.
+        user = self.request.user
+        return f'feed-count:{visibility_version(user)}:{visibility_class(user)}:{digest}'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start(request):
+            return super().paginate_queryset(queryset, request, view)
+        queryset, cursor = self.keyset_queryset(queryset, request)
+        return self.keyset_page(list(queryset[:self.page_size + 1]), cursor)
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset for the async read views; runs every query through the async ORM."""
+        if self.start(request):
+            queryset, cursor = self.keyset_queryset(queryset, request)
+            return self.keyset_page([obj async for obj in queryset[:self.page_size + 1]], cursor)
+
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return self.page.object_list
+
+    def start(self, request):
+        """Remembers request and returns whether it asks for keyset pagination."""
+        self.request = request
+        self.cursor_mode = (
+            self.cursor_only or
+            request.query_params.get(self.mode_query_param) == 'cursor' or
+            self.cursor_query_param in request.query_params
+        )
+        return self.cursor_mode
+
+    def keyset_queryset(self, queryset, request):
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        field = self.cursor_field
+        if cursor is None:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            value, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+                ).order_by(f'-{field}', '-id')
+        return queryset, cursor
+
+    def keyset_page(self, results, cursor):
+        """Trims the one-row lookahead from results and sets the cursors around them."""
+        reverse = cursor is not None and cursor[2]
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.next_cursor = self.encode_cursor(results[-1], False) if self.has_next and results else None
+        self.previous_cursor = self.encode_cursor(results[0], True) if self.has_previous and results else None
+        return results
 
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response({
+                'next_cursor': self.next_cursor,
+                'previous_cursor': self.previous_cursor,
+                'next_page_url': self.get_cursor_link(self.next_cursor),
+                'previous_page_url': self.get_cursor_link(self.previous_cursor),
+                'results': data
+            })
         return Response({
             'current_page': self.page.number,
             'total_pages': self.page.paginator.num_pages,
             'total_count': self.page.paginator.count,
+            'count_is_approximate': self.page.paginator.approximate,
             'next_page_url': self.get_next_link(),
             'previous_page_url': self.get_previous_link(),
             'results': data
-        })
\ No newline at end of file
+        })
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def cursor_value(self, instance):
+        return instance.timestamp.isoformat()
+
+    def parse_cursor_value(self, value):
+        return datetime.fromisoformat(value)
+
+    def encode_cursor(self, instance, reverse):
+        position = f"{self.cursor_value(instance)}|{instance.pk}|{int(reverse)}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            return self.parse_cursor_value(value), int(pk), reverse == '1'
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+class PostsPagination(FeedPagination):
+    page_size = 10
+
+class SearchPagination(FeedPagination):
+    """Cursor pages over search results, ordered by the ``rank`` annotation."""
+    page_size = 10
+    cursor_field = 'rank'
+    cursor_only = True
+
+    def cursor_value(self, instance):
+        return repr(instance.rank)
+
+    def parse_cursor_value(self, value):
+        return float(value)
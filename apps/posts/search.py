@@ -0,0 +1,32 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.comments.models import Comments
+from .models import Post, SEARCH_CONFIG
+from .utils import get_accessible_posts
+
+# How much the best matching comment counts towards a post's rank, relative to its own text.
+COMMENT_RANK_WEIGHT = 0.5
+
+def search_query(text):
+    return SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+
+def search_posts(user, text):
+    """Posts user can read whose title, content or comments match text, annotated with ``rank``.
+
+    Matching post ids are collected from both GIN indexes first, so the
+    visibility filter and ranking only run over the matches.
+    """
+    query = search_query(text)
+    matching_comments = Comments.objects.filter(search_vector=query)
+    matches = Post.objects.filter(search_vector=query).values('id').union(matching_comments.values('post_id'))
+    best_comment = matching_comments.filter(post=OuterRef('pk')).annotate(
+        rank=SearchRank(F('search_vector'), query)).order_by('-rank').values('rank')[:1]
+    return get_accessible_posts(user).filter(pk__in=matches).annotate(
+        rank=SearchRank(F('search_vector'), query) +
+             Value(COMMENT_RANK_WEIGHT) * Coalesce(Subquery(best_comment), Value(0.0), output_field=FloatField())
+    ).order_by('-rank', '-id')
+
+def autocomplete_titles(user, prefix, limit=10):
+    """Newest readable posts whose title starts with prefix, case-insensitively."""
+    return get_accessible_posts(user).filter(title__istartswith=prefix).values('id', 'title')[:limit]
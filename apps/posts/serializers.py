@@ -1,6 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework import exceptions
-from .models import Post, Permission, Categories
+from .cache import bump_visibility_on_commit
+from .models import Post, Permission, Categories, VISIBILITY_FIELDS
+from .categories import category_id, category_ids, category_name
+from .utils import REPRESENTATION_FIELDS
 
 class PermissionsSerializer(serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Categories.objects.all(), source='category_name')
@@ -20,28 +24,31 @@ class post_serializer(serializers.ModelSerializer):
         read_only_fields = ['author', 'excerpt', 'timestamp']
     
     def to_internal_value(self, data):
+        if self.partial and 'permissions_set' not in data:
+            return data
         permissions_set_data = data.get('permissions_set', [])
         for perm_data in permissions_set_data:
-            category_name = perm_data.get('category')
-            if category_name:
-                try:
-                    category = Categories.objects.get(category_name=category_name)
-                    perm_data['category'] = category.id
-                except Categories.DoesNotExist:
-                    raise serializers.ValidationError(f"Category with name {category_name} does not exist.")
+            name = perm_data.get('category')
+            if name:
+                perm_data['category'] = category_id(name)
+                if perm_data['category'] is None:
+                    raise serializers.ValidationError({'permissions_set': f"Category with name {name} does not exist."})
             else:
-                raise serializers.ValidationError("Category name is required in permissions.")
+                raise serializers.ValidationError({'permissions_set': "Category name is required in permissions."})
         data['permissions_set'] = permissions_set_data
       
         return data
     
     def validate(self, data):
         
-        if 'title' not in data or not data['title']:
+        if ('title' in data or not self.partial) and not data.get('title'):
             raise exceptions.ValidationError("title is required.")
         
-        if 'content' not in data or not data['content']:
+        if ('content' in data or not self.partial) and not data.get('content'):
             raise exceptions.ValidationError("content is required.")
+
+        if self.partial and 'permissions_set' not in data:
+            return data
         
         permissions_set = data.get('permissions_set', [])
         provided_category_ids = [perm['category'] for perm in permissions_set]
@@ -52,49 +59,106 @@ class post_serializer(serializers.ModelSerializer):
         if len(set(provided_category_ids)) != 4:
             raise exceptions.ValidationError("Each permission must correspond to a different category.")
 
-        all_category_ids = set(Categories.objects.values_list('id', flat=True))
-        if not set(provided_category_ids).issubset(all_category_ids):
+        if not set(provided_category_ids).issubset(category_ids()):
             raise exceptions.ValidationError("One or more provided categories are invalid.")
 
         return data
     
+    @transaction.atomic
     def create(self, validated_data):
         permissions_data = validated_data.pop('permissions_set')
         author = self.context['request'].user
-        post = Post.objects.create(
+        post = Post(
             author=author,
             title=validated_data['title'],
             content=validated_data['content'],
             excerpt=validated_data['content'][:200],
         )
-        
-        for perm_data in permissions_data:
-            Permission.objects.create(post=post, category_id=perm_data['category'], access=perm_data['access'])
+        # The access columns are known up front, so no sync query is needed after the insert.
+        post.set_visibility((perm['category'], perm['access']) for perm in permissions_data)
+        post.save()
+        Permission.objects.bulk_create([
+            Permission(post=post, category_id=perm['category'], access=perm['access'])
+            for perm in permissions_data
+        ])
         return post
     
+    @transaction.atomic
     def update(self, instance, validated_data):
-        permissions_data = validated_data.pop('permissions_set')
+        permissions_data = validated_data.pop('permissions_set', None)
         
         instance.title = validated_data.get('title', instance.title)
         instance.content = validated_data.get('content', instance.content)
         instance.excerpt = validated_data.get('content', instance.content)[:200]
-        instance.save()
+        update_fields = ['title', 'content', 'excerpt', 'updated_at']
 
-        instance.permissions_set.all().delete()
-        for perm_data in permissions_data:
-            Permission.objects.create(post=instance, category_id=perm_data['category'], access=perm_data['access'])
+        readers = instance.visibility_scopes()
+        permissions_changed = permissions_data is not None and self.update_permissions(instance, permissions_data)
+        if permissions_changed:
+            instance.set_visibility((perm['category'], perm['access']) for perm in permissions_data)
+            update_fields += VISIBILITY_FIELDS.values()
+        instance.save(update_fields=update_fields)
+        changed = readers ^ instance.visibility_scopes()
+        if changed:
+            bump_visibility_on_commit(*changed)
         return instance
+
+    def update_permissions(self, instance, permissions_data):
+        """Write only the permission rows that differ; returns whether anything changed."""
+        existing = {permission.category_id: permission for permission in instance.permissions_set.all()}
+        created, changed = [], []
+        for perm in permissions_data:
+            permission = existing.pop(perm['category'], None)
+            if permission is None:
+                created.append(Permission(post=instance, category_id=perm['category'], access=perm['access']))
+            elif permission.access != perm['access']:
+                permission.access = perm['access']
+                changed.append(permission)
+        if changed:
+            Permission.objects.bulk_update(changed, ['access'])
+        if created:
+            Permission.objects.bulk_create(created)
+        if existing:
+            Permission.objects.filter(pk__in=[permission.pk for permission in existing.values()]).delete()
+        return bool(created or changed or existing)
     
     def to_representation(self, instance):
-        represent=dict()
-        represent['id']=instance.id
-        represent['author']=instance.author.username
-        represent['title']=instance.title
-        represent['content']=instance.content
-        represent['excerpt']=instance.excerpt
-        represent['timestamp']=instance.timestamp
-        permissions = instance.permissions_set.all()
-        represent['permissions'] = {permission.category.category_name: permission.access for permission in permissions}
+        # Only the requested keys are read, so deferred columns are never loaded one row at a time.
+        fields = self.context.get('fields')
+        if fields is None:
+            fields = REPRESENTATION_FIELDS
+        values = {
+            'id': lambda: instance.id,
+            'author': lambda: instance.author.username,
+            'title': lambda: instance.title,
+            'content': lambda: instance.content,
+            'excerpt': lambda: instance.excerpt,
+            'timestamp': lambda: instance.timestamp,
+            'like_count': lambda: instance.like_count,
+            'comment_count': lambda: instance.comment_count,
+            'permissions': lambda: {
+                category_name(permission.category_id): permission.access
+                for permission in instance.permissions_set.all()
+            },
+            'liked_by_me': lambda: getattr(instance, 'liked_by_me', False),
+            'commented_by_me': lambda: getattr(instance, 'commented_by_me', False),
+        }
+        represent = dict()
+        for field in fields:
+            represent[field] = values[field]()
         return represent
-    
 
+class EngagementQuerySerializer(serializers.Serializer):
+    ids = serializers.CharField()
+    likers = serializers.IntegerField(required=False, default=3, min_value=0, max_value=20)
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(int(post_id) for post_id in value.split(',') if post_id.strip()))
+        except ValueError:
+            raise serializers.ValidationError("Provide a comma-separated list of post ids.")
+        if not ids:
+            raise serializers.ValidationError("Provide at least one post id.")
+        if len(ids) > 100:
+            raise serializers.ValidationError("Ask for at most 100 posts at once.")
+        return ids
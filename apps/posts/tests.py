@@ -1,12 +1,36 @@
 from rest_framework.test import APITestCase
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from io import StringIO
+from datetime import timedelta
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from unittest import mock
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from django.urls import reverse
 import json
-from apps.posts.models import Post, Categories
+import re
+from apps.posts.models import Post, Categories, Permission, ACCESS_NONE, ACCESS_READ, ACCESS_READ_EDIT, VISIBILITY_FIELDS
+from apps.posts.utils import get_accessible_posts
+from apps.posts.cache import visibility_version
+from apps.posts.permissions import CanViewPost
+from apps.posts.pagination import PostsPagination, SearchPagination
+from apps.posts.search import search_posts, autocomplete_titles
+from apps.posts import access
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
 from apps.users.factories import UserFactory, TeamFactory
-from apps.users.models import Team
+from apps.users.models import Team, User
 from apps.posts.factories import PostFactory, CategoriesFactory
+from apps.posts.categories import category_id, category_ids, category_name
+from apps.likes.factories import LikeFactory
+from apps.likes.models import Like
+from apps.comments.factories import CommentsFactory
 
 class CreatePostTestCase(APITestCase):
     def setUp(self):
@@ -630,6 +654,47 @@ class DetailViewTest(APITestCase):
         self.assertContains(response, self.post6.title)
         self.assertContains(response, self.post7.title)
         
+    def test_retrieve_query_count(self):
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('post-detail', kwargs={'pk': self.post4.pk})
+        category_ids()
+        # post with author, permissions
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_permission_check_is_memoized(self):
+        http_request = APIRequestFactory().get('/')
+        force_authenticate(http_request, user=self.user1)
+        request = Request(http_request)
+        self.assertEqual(request.user, self.user1)
+        post = Post.objects.select_related('author').get(pk=self.post4.pk)
+        permission = CanViewPost()
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_object_permission(request, None, post))
+            self.assertTrue(permission.has_object_permission(request, None, post))
+
+        post = Post.objects.get(pk=self.post5.pk)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(permission.get_access_level(request, post), 0)
+
+    def test_access_service(self):
+        http_request = APIRequestFactory().get('/')
+        force_authenticate(http_request, user=self.user1)
+        request = Request(http_request)
+        self.assertEqual(request.user, self.user1)
+        post_ids = [post.pk for post in (self.post1, self.post2, self.post3, self.post4, self.post5, self.post6, self.post7)]
+        with self.assertNumQueries(1):
+            self.assertEqual(access.readable_post_ids(request, post_ids + [999999]),
+                             {self.post1.pk, self.post2.pk, self.post4.pk})
+            self.assertTrue(access.can_read_post(request, self.post4.pk))
+            self.assertTrue(access.can_edit_post(request, self.post4.pk))
+            self.assertFalse(access.can_edit_post(request, self.post2.pk))
+            self.assertFalse(access.can_read_post(request, self.post6.pk))
+            self.assertFalse(access.post_exists(request, 999999))
+            self.assertFalse(access.post_exists(request, 'not-an-id'))
+
     def test_empty_list_posts(self):
         self.post1.delete()
         self.post2.delete()
@@ -640,4 +705,1093 @@ class DetailViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 0)
 
-        
\ No newline at end of file
+
+class CategoryRegistryTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.categories = {
+            name: Categories.objects.create(category_name=name)
+            for name in ['Public', 'Authenticated', 'Team', 'Author']
+        }
+
+    def test_registry_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(category_id('Team'), self.categories['Team'].id)
+            self.assertEqual(category_name(self.categories['Author'].id), 'Author')
+            self.assertEqual(category_ids(), {category.id for category in self.categories.values()})
+            self.assertIsNone(category_id('Missing'))
+
+    def test_registry_follows_category_changes(self):
+        self.assertEqual(category_id('Public'), self.categories['Public'].id)
+        category = self.categories['Public']
+        category.category_name = 'Everyone'
+        category.save()
+        self.assertIsNone(category_id('Public'))
+        self.assertEqual(category_id('Everyone'), category.id)
+        category.delete()
+        self.assertIsNone(category_id('Everyone'))
+
+    def test_create_post_does_not_query_categories(self):
+        self.client.force_authenticate(user=self.user)
+        category_ids()
+        post_data = {
+            'title': 'Test Title',
+            'content': 'Test Content',
+            'permissions_set': [
+                {'category': 'Public', 'access': 'read'},
+                {'category': 'Authenticated', 'access': 'read'},
+                {'category': 'Team', 'access': 'read_edit'},
+                {'category': 'Author', 'access': 'read_edit'}
+            ]
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('list-posts'), post_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([q['sql'] for q in queries if 'posts_categories' in q['sql']])
+        self.assertEqual(response.data['permissions']['Team'], 'read_edit')
+
+def write_queries(queries):
+    return [q['sql'] for q in queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+class PermissionWritesTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        for name in ['Public', 'Authenticated', 'Team', 'Author']:
+            Categories.objects.create(category_name=name)
+        self.client.force_authenticate(user=self.user)
+        self.post_data = {
+            'title': 'Test Title',
+            'content': 'Test Content',
+            'permissions_set': [
+                {'category': 'Public', 'access': 'none'},
+                {'category': 'Authenticated', 'access': 'read'},
+                {'category': 'Team', 'access': 'read_edit'},
+                {'category': 'Author', 'access': 'read_edit'}
+            ]
+        }
+
+    def create_post(self):
+        response = self.client.post(reverse('list-posts'), self.post_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data['id'])
+
+    def test_create_is_two_inserts(self):
+        with CaptureQueriesContext(connection) as queries:
+            post = self.create_post()
+        writes = write_queries(queries)
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(all(sql.startswith('INSERT') for sql in writes))
+        self.assertEqual(post.permissions_set.count(), 4)
+        self.assertEqual(post.authenticated_access, ACCESS_READ)
+        self.assertEqual(post.team_access, ACCESS_READ_EDIT)
+
+    def test_update_writes_only_changed_permissions(self):
+        post = self.create_post()
+        permission_ids = set(post.permissions_set.values_list('id', flat=True))
+        self.post_data['permissions_set'][0]['access'] = 'read'
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, self.post_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        writes = write_queries(queries)
+        # one permission row, one post row
+        self.assertEqual(len(writes), 2)
+        self.assertFalse([sql for sql in writes if sql.startswith(('INSERT', 'DELETE'))])
+        post.refresh_from_db()
+        self.assertEqual(post.public_access, ACCESS_READ)
+        self.assertEqual(response.data['permissions']['Public'], 'read')
+        self.assertEqual(set(post.permissions_set.values_list('id', flat=True)), permission_ids)
+
+    def test_unchanged_permissions_are_not_written(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, self.post_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(write_queries(queries)), 1)
+
+    def test_patch_without_permissions(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'title': 'New Title'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(write_queries(queries)), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.title, 'New Title')
+        self.assertEqual(post.content, 'Test Content')
+        self.assertEqual(post.permissions_set.count(), 4)
+
+    def test_patch_with_empty_title(self):
+        post = self.create_post()
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        response = self.client.patch(url, {'title': ''}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class VisibilityColumnsTest(APITestCase):
+
+    def setUp(self):
+        self.team = TeamFactory(tname="Test Team")
+        self.user = UserFactory(username="testuser", email="testuser@example.com", team=self.team, password="testpassword")
+        self.Public_category = CategoriesFactory(category_name='Public')
+        self.Authenticated_category = CategoriesFactory(category_name='Authenticated')
+        self.Team_category = CategoriesFactory(category_name='Team')
+        self.Author_category = CategoriesFactory(category_name='Author')
+        self.post = PostFactory(author=self.user, title='title post',
+            permissions_set=[
+                {'category': self.Public_category, 'access': 'none'},
+                {'category': self.Authenticated_category, 'access': 'read'},
+                {'category': self.Team_category, 'access': 'read_edit'},
+                {'category': self.Author_category, 'access': 'read_edit'}
+            ])
+
+    def test_columns_follow_permissions(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.public_access, ACCESS_NONE)
+        self.assertEqual(self.post.authenticated_access, ACCESS_READ)
+        self.assertEqual(self.post.team_access, ACCESS_READ_EDIT)
+        self.assertEqual(self.post.author_access, ACCESS_READ_EDIT)
+
+    def test_columns_follow_permission_changes(self):
+        permission = Permission.objects.get(post=self.post, category=self.Public_category)
+        permission.access = 'read'
+        permission.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.public_access, ACCESS_READ)
+
+        Permission.objects.get(post=self.post, category=self.Team_category).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.team_access, ACCESS_NONE)
+
+    def test_columns_follow_api_update(self):
+        self.client.login(username='testuser', password='testpassword')
+        url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        updated_data = {
+            'title': 'Updated title post',
+            'content': 'Updated content for post',
+            'permissions_set': [
+                {'category': 'Public', 'access': 'read_edit'},
+                {'category': 'Authenticated', 'access': 'none'},
+                {'category': 'Team', 'access': 'read'},
+                {'category': 'Author', 'access': 'read'}
+            ]
+        }
+        response = self.client.put(url, updated_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.public_access, ACCESS_READ_EDIT)
+        self.assertEqual(self.post.authenticated_access, ACCESS_NONE)
+        self.assertEqual(self.post.team_access, ACCESS_READ)
+        self.assertEqual(self.post.author_access, ACCESS_READ)
+
+    def test_author_team_follows_author(self):
+        self.assertEqual(self.post.author_team_id, self.team.id)
+        other_team = TeamFactory(tname="Other Team")
+        user = type(self.user).objects.get(pk=self.user.pk)
+        user.team = other_team
+        user.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.author_team_id, other_team.id)
+
+        other_team.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.author_team_id, 1)
+        self.assertEqual(type(self.user).objects.get(pk=self.user.pk).team_id, 1)
+
+    def test_team_change_right_after_create(self):
+        user = UserFactory(team=self.team)
+        post = PostFactory(author=user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.save()
+        self.assertEqual(callbacks, [])
+
+        other_team = TeamFactory(tname="Other Team")
+        user.team = other_team
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.save()
+        self.assertEqual(len(callbacks), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.author_team_id, other_team.id)
+
+    def test_stale_save_keeps_author_team(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        other_team = TeamFactory(tname="Other Team")
+        user = type(self.user).objects.get(pk=self.user.pk)
+        user.team = other_team
+        user.save()
+        stale.title = 'Renamed'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Renamed')
+        self.assertEqual(self.post.author_team_id, other_team.id)
+
+    def test_feed_query_has_no_distinct(self):
+        sql = str(get_accessible_posts(self.user).query)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('posts_permission', sql)
+        self.assertNotIn('users_user', sql)
+
+
+
+class FeedSerializationTest(APITestCase):
+    def setUp(self):
+        categories = [Categories.objects.create(category_name=name) for name in ['Public', 'Authenticated', 'Team', 'Author']]
+        self.admin = UserFactory(is_admin=True)
+        self.reader = UserFactory()
+        authors = [UserFactory() for _ in range(5)]
+        posts = []
+        for i in range(100):
+            post = Post(author=authors[i % 5], author_team_id=authors[i % 5].team_id,
+                        title=f'title post {i}', content='content', excerpt='content')
+            post.set_visibility((category.id, 'read') for category in categories)
+            posts.append(post)
+        Post.objects.bulk_create(posts)
+        Permission.objects.bulk_create([
+            Permission(post=post, category=category, access='read')
+            for post in posts for category in categories
+        ])
+
+    def feed_queries(self, page_size, user=None):
+        self.client.force_authenticate(user=user)
+        with mock.patch.object(PostsPagination, 'page_size', page_size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), page_size)
+        self.assertEqual(len(response.data['results'][0]['permissions']), 4)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        category_ids()
+        for user in [None, self.reader, self.admin]:
+            with self.subTest(user=user):
+                self.assertEqual(self.feed_queries(10, user), self.feed_queries(100, user))
+                # count, page, posts with authors, permissions
+                self.assertEqual(self.feed_queries(10, user), 4)
+
+class SparseFieldsetTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.public = Categories.objects.create(category_name='Public')
+        self.posts = [
+            PostFactory(author=self.user, title=f'title post {i}',
+                permissions_set=[{'category': self.public, 'access': 'read'}])
+            for i in range(3)
+        ]
+        category_ids()
+
+    def test_list_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('list-posts'), {'fields': 'title,excerpt,id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'excerpt'])
+        # count, page, posts; no author join, no permissions query
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('"content"', queries[-1]['sql'])
+        self.assertNotIn('users_user', queries[-1]['sql'])
+
+    @override_settings(ALLOWED_HOSTS=[])
+    def test_benchmark_command(self):
+        for i in range(3, 12):
+            PostFactory(author=self.user, title=f'title post {i}',
+                permissions_set=[{'category': self.public, 'access': 'read'}])
+        out = StringIO()
+        call_command('benchmark_fieldsets', repeat=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 11)
+        self.assertTrue(lines[1].startswith('list'))
+
+    def test_list_exclude(self):
+        response = self.client.get(reverse('list-posts'), {'exclude': 'content,permissions'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data['results'][0]
+        self.assertNotIn('content', result)
+        self.assertNotIn('permissions', result)
+        self.assertEqual(result['author'], self.user.username)
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('list-posts'), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('list-posts'), {'fields': 'title', 'exclude': 'content'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_fields(self):
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'id,title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.posts[0].pk, 'title': 'title post 0'})
+        response = self.client.get(url, {'fields': 'author,permissions'})
+        self.assertEqual(response.data, {'author': self.user.username, 'permissions': {'Public': 'read'}})
+
+    def test_etag_varies_with_fields(self):
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'fields': 'title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        list_etag = self.client.get(reverse('list-posts'))['ETag']
+        response = self.client.get(reverse('list-posts'), {'fields': 'title'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class ViewerFlagsTest(APITestCase):
+    def setUp(self):
+        self.reader = UserFactory()
+        self.other = UserFactory()
+        self.posts = [
+            PostFactory(title=f'title post {i}', permissions_set=[
+                {'category': Categories.objects.get_or_create(category_name=name)[0], 'access': 'read'}
+                for name in ['Public', 'Authenticated', 'Team']
+            ])
+            for i in range(3)
+        ]
+        LikeFactory(post=self.posts[0], user=self.reader)
+        CommentsFactory(post=self.posts[1], user=self.reader)
+        LikeFactory(post=self.posts[2], user=self.other)
+        category_ids()
+
+    def flags(self, results):
+        return {post['id']: (post['liked_by_me'], post['commented_by_me']) for post in results}
+
+    def test_list_flags(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(self.flags(response.data['results']), {
+            self.posts[0].pk: (True, False),
+            self.posts[1].pk: (False, True),
+            self.posts[2].pk: (False, False),
+        })
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(set(self.flags(response.data['results']).values()), {(False, False)})
+
+    def test_flags_are_part_of_the_posts_query(self):
+        self.client.force_authenticate(user=self.reader)
+        with CaptureQueriesContext(connection) as with_flags:
+            self.client.get(reverse('list-posts'))
+        with CaptureQueriesContext(connection) as without_flags:
+            self.client.get(reverse('list-posts'), {'exclude': 'liked_by_me,commented_by_me'})
+        self.assertEqual(len(with_flags), len(without_flags))
+        self.assertNotIn('likes_like', without_flags[1]['sql'])
+
+    def test_detail_flags_and_etag(self):
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        self.client.force_authenticate(user=self.reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'id,liked_by_me,commented_by_me'})
+        self.assertEqual(response.data, {'id': self.posts[0].pk, 'liked_by_me': True, 'commented_by_me': False})
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, {'fields': 'id,liked_by_me,commented_by_me'},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Same post version, different viewer: the representation differs, so must the ETag.
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(url, {'fields': 'id,liked_by_me,commented_by_me'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['liked_by_me'])
+
+    def test_list_etag_follows_flags(self):
+        self.client.force_authenticate(user=self.other)
+        etag = self.client.get(reverse('list-posts'))['ETag']
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(self.client.get(reverse('list-posts'), HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_200_OK)
+
+class EngagementTest(APITestCase):
+    def setUp(self):
+        self.reader = UserFactory()
+        readable = [
+            {'category': Categories.objects.get_or_create(category_name=name)[0], 'access': 'read'}
+            for name in ['Public', 'Authenticated', 'Team']
+        ]
+        self.posts = [PostFactory(permissions_set=readable) for _ in range(3)]
+        self.hidden = PostFactory(permissions_set=[
+            {'category': Categories.objects.get_or_create(category_name=name)[0], 'access': 'none'}
+            for name in ['Public', 'Authenticated', 'Team']
+        ])
+        self.likers = UserFactory.create_batch(4)
+        now = timezone.now()
+        for age, user in enumerate(self.likers):
+            like = LikeFactory(post=self.posts[0], user=user)
+            Like.objects.filter(pk=like.pk).update(timestamp=now - timedelta(minutes=age))
+        LikeFactory(post=self.hidden, user=self.reader)
+        CommentsFactory(post=self.posts[0], user=self.reader)
+        self.latest = CommentsFactory(post=self.posts[0], user=self.likers[0])
+        CommentsFactory(post=self.posts[1], user=self.reader)
+        category_ids()
+
+    def get(self, ids, **params):
+        return self.client.get(reverse('post-engagement'), {'ids': ','.join(map(str, ids)), **params})
+
+    def test_summary(self):
+        self.client.force_authenticate(user=self.reader)
+        ids = [self.posts[2].pk, self.posts[0].pk, self.hidden.pk, self.posts[1].pk, self.posts[0].pk]
+        with self.assertNumQueries(2):
+            response = self.get(ids, likers=2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['post'] for row in response.data['results']],
+                         [self.posts[2].pk, self.posts[0].pk, self.posts[1].pk])
+        first = response.data['results'][1]
+        self.assertEqual(first['like_count'], 4)
+        self.assertEqual(first['comment_count'], 2)
+        self.assertEqual(first['latest_comment_at'], self.latest.timestamp)
+        self.assertEqual(first['recent_likers'], [user.username for user in self.likers[:2]])
+        self.assertEqual(response.data['results'][0], {
+            'post': self.posts[2].pk, 'like_count': 0, 'comment_count': 0,
+            'latest_comment_at': None, 'recent_likers': [],
+        })
+
+    def test_totals_come_from_the_post_counters(self):
+        Post.objects.filter(pk=self.posts[0].pk).update(like_count=40, comment_count=9)
+        row = self.get([self.posts[0].pk]).data['results'][0]
+        self.assertEqual((row['like_count'], row['comment_count']), (40, 9))
+        self.assertEqual(len(row['recent_likers']), 3)
+
+    def test_counts_without_likers(self):
+        response = self.get([self.posts[0].pk], likers=0)
+        self.assertEqual(response.data['results'][0]['like_count'], 4)
+        self.assertEqual(response.data['results'][0]['recent_likers'], [])
+
+    def test_invalid_ids(self):
+        for ids in ['', 'a,b', ',']:
+            response = self.client.get(reverse('post-engagement'), {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(range(1, 102)).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get([self.posts[0].pk], likers=50).status_code, status.HTTP_400_BAD_REQUEST)
+
+class SearchTest(APITestCase):
+    def setUp(self):
+        self.author = UserFactory()
+        self.reader = UserFactory()
+        self.public = Categories.objects.create(category_name='Public')
+        self.authenticated = Categories.objects.create(category_name='Authenticated')
+        self.author_category = Categories.objects.create(category_name='Author')
+        everyone = [
+            {'category': self.public, 'access': 'read'},
+            {'category': self.authenticated, 'access': 'read'},
+            {'category': self.author_category, 'access': 'read_edit'},
+        ]
+        self.title_match = PostFactory(author=self.author, title='Tuning database performance',
+            content='Indexes and query plans.', permissions_set=everyone)
+        self.content_match = PostFactory(author=self.author, title='Weekly notes',
+            content='Some thoughts on performance budgets.', permissions_set=everyone)
+        self.comment_match = PostFactory(author=self.author, title='Release day',
+            content='We shipped it.', permissions_set=everyone)
+        CommentsFactory(post=self.comment_match, user=self.reader, comment='Great performance gains!')
+        self.private = PostFactory(author=self.author, title='Private performance review',
+            content='Only for me.', permissions_set=[{'category': self.author_category, 'access': 'read'}])
+        PostFactory(author=self.author, title='Cooking pasta', content='Boil water.', permissions_set=everyone)
+
+    def search(self, params, user=None):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('post-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_results_are_ranked_and_visible(self):
+        response = self.search({'q': 'performance'})
+        ids = [post['id'] for post in response.data['results']]
+        self.assertEqual(ids, [self.title_match.pk, self.content_match.pk, self.comment_match.pk])
+        self.assertIn('next_cursor', response.data)
+
+        response = self.search({'q': 'performance'}, user=self.author)
+        ids = [post['id'] for post in response.data['results']]
+        self.assertIn(self.private.pk, ids)
+        self.assertEqual(len(ids), 4)
+
+    def test_stemming_and_websearch_syntax(self):
+        response = self.search({'q': 'performing -budgets'})
+        ids = {post['id'] for post in response.data['results']}
+        self.assertEqual(ids, {self.title_match.pk, self.comment_match.pk})
+
+    def test_cursor_pages(self):
+        seen = []
+        params = {'q': 'performance'}
+        with mock.patch.object(SearchPagination, 'page_size', 1):
+            while True:
+                response = self.search(params)
+                seen += [post['id'] for post in response.data['results']]
+                if not response.data['next_cursor']:
+                    break
+                params = {'q': 'performance', 'cursor': response.data['next_cursor']}
+            previous = self.search({'q': 'performance', 'cursor': response.data['previous_cursor']})
+        self.assertEqual(seen, [self.title_match.pk, self.content_match.pk, self.comment_match.pk])
+        self.assertEqual([post['id'] for post in previous.data['results']], [self.content_match.pk])
+
+    def test_search_follows_edits(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('post-detail', kwargs={'pk': self.content_match.pk})
+        response = self.client.patch(url, {'content': 'Nothing to see.'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post['id'] for post in self.search({'q': 'budgets'}).data['results']]
+        self.assertEqual(ids, [])
+
+    def test_query_is_required(self):
+        response = self.client.get(reverse('post-search'), {'q': ' '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_title_autocomplete(self):
+        response = self.client.get(reverse('post-title-autocomplete'), {'q': 'tUNING'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': self.title_match.pk, 'title': 'Tuning database performance'}])
+        response = self.client.get(reverse('post-title-autocomplete'), {'q': 'Private'})
+        self.assertEqual(response.data, [])
+        response = self.client.get(reverse('post-title-autocomplete'), {'q': '%'})
+        self.assertEqual(response.data, [])
+
+class AsyncReadViewsTest(APITestCase):
+    """The ASGI read path answers exactly like the DRF views."""
+
+    def setUp(self):
+        self.team = TeamFactory()
+        self.author = UserFactory(team=self.team)
+        self.teammate = UserFactory(team=self.team)
+        self.admin = UserFactory(is_admin=True)
+        categories = {name: Categories.objects.create(category_name=name) for name in ['Public', 'Authenticated', 'Team', 'Author']}
+        grants = [
+            {'Public': 'read', 'Authenticated': 'read', 'Team': 'read', 'Author': 'read_edit'},
+            {'Public': 'none', 'Authenticated': 'none', 'Team': 'read', 'Author': 'read_edit'},
+            {'Public': 'none', 'Authenticated': 'none', 'Team': 'none', 'Author': 'read'},
+        ]
+        self.posts = []
+        for i in range(12):
+            post = PostFactory(author=self.author, title=f'title post {i}', permissions_set=[
+                {'category': categories[name], 'access': access} for name, access in grants[i % 3].items()
+            ])
+            LikeFactory(post=post, user=self.teammate)
+            CommentsFactory(post=post, user=self.teammate)
+            self.posts.append(post)
+        self.hidden = self.posts[2]
+
+    async def compare(self, user, url, params=None, status_code=status.HTTP_200_OK):
+        if user is None:
+            await self.async_client.alogout()
+            await sync_to_async(self.client.logout)()
+        else:
+            await self.async_client.aforce_login(user)
+            await sync_to_async(self.client.force_login)(user)
+        expected = await sync_to_async(self.client.get)(url, params or {})
+        response = await self.async_client.get(url, params or {})
+        if status_code is not None:
+            self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response, expected
+
+    async def test_lists_match(self):
+        requests = [
+            (reverse('list-posts'), None),
+            (reverse('list-posts'), {'page': 2}),
+            (reverse('list-posts'), {'pagination': 'cursor'}),
+            (reverse('list-posts'), {'fields': 'id,title'}),
+            (reverse('comments-list'), None),
+            (reverse('comments-list'), {'post': self.posts[0].pk}),
+            (reverse('comments-list'), {'user': self.teammate.pk, 'pagination': 'cursor'}),
+            (reverse('like-list'), None),
+            (reverse('like-list'), {'post': self.posts[1].pk}),
+        ]
+        for user in [None, self.teammate, self.author, self.admin]:
+            for url, params in requests:
+                with self.subTest(user=user, url=url, params=params):
+                    response, expected = await self.compare(user, url, params, status_code=None)
+                    if url == reverse('list-posts') and response.status_code == status.HTTP_200_OK:
+                        self.assertEqual(response['ETag'], expected['ETag'])
+
+    async def test_detail_matches(self):
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        for user in [None, self.teammate, self.admin]:
+            with self.subTest(user=user):
+                response, expected = await self.compare(user, url)
+                self.assertEqual(response['ETag'], expected['ETag'])
+                self.assertEqual(response['Last-Modified'], expected['Last-Modified'])
+        await self.compare(self.teammate, url, {'fields': 'title,permissions'})
+        await self.compare(self.teammate, reverse('post-detail', kwargs={'pk': self.hidden.pk}),
+                           status_code=status.HTTP_404_NOT_FOUND)
+        await self.compare(self.teammate, reverse('post-detail', kwargs={'pk': 0}),
+                           status_code=status.HTTP_404_NOT_FOUND)
+
+    async def test_head_matches(self):
+        for user in [None, self.teammate, self.admin]:
+            for post in [self.posts[0], self.hidden]:
+                with self.subTest(user=user, post=post):
+                    if user is None:
+                        await self.async_client.alogout()
+                        await sync_to_async(self.client.logout)()
+                    else:
+                        await self.async_client.aforce_login(user)
+                        await sync_to_async(self.client.force_login)(user)
+                    url = reverse('post-detail', kwargs={'pk': post.pk})
+                    expected = await sync_to_async(self.client.head)(url)
+                    response = await self.async_client.head(url)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertFalse(response.has_header('ETag'))
+
+    async def test_errors_match(self):
+        await self.compare(None, reverse('comments-list'), {'post': self.hidden.pk}, status.HTTP_403_FORBIDDEN)
+        await self.compare(self.teammate, reverse('like-list'), {'user': 0}, status.HTTP_400_BAD_REQUEST)
+        await self.compare(None, reverse('list-posts'), {'page': 99}, status.HTTP_404_NOT_FOUND)
+        await self.compare(None, reverse('list-posts'), {'fields': 'secret'}, status.HTTP_400_BAD_REQUEST)
+
+    async def test_conditional_get(self):
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        response = await self.async_client.get(url)
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_writes_use_drf_views(self):
+        await self.async_client.aforce_login(self.author)
+        url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+        response = await self.async_client.patch(url, {'title': 'Patched'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((await self.async_client.get(url)).json()['title'], 'Patched')
+
+class CursorPaginationTest(APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory(username="testuser", email="testuser@example.com", password="testpassword")
+        self.Public_category = CategoriesFactory(category_name='Public')
+        self.posts = [
+            PostFactory(author=self.user, title=f'title post {i}',
+                permissions_set=[{'category': self.Public_category, 'access': 'read'}])
+            for i in range(25)
+        ]
+
+    def test_cursor_pages_cover_feed_without_count(self):
+        url = reverse('list-posts')
+        response = self.client.get(url, {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('total_count', response.data)
+        self.assertIsNone(response.data['previous_cursor'])
+        titles = [post['title'] for post in response.data['results']]
+
+        while response.data['next_cursor']:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'cursor': response.data['next_cursor']})
+            self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+            titles += [post['title'] for post in response.data['results']]
+
+        expected = [post.title for post in sorted(self.posts, key=lambda post: (post.timestamp, post.id), reverse=True)]
+        self.assertEqual(titles, expected)
+
+        response = self.client.get(url, {'cursor': response.data['previous_cursor']})
+        self.assertEqual([post['title'] for post in response.data['results']], expected[10:20])
+        self.assertIsNotNone(response.data['previous_cursor'])
+        self.assertIsNotNone(response.data['next_cursor'])
+
+    def test_page_number_mode_still_counts(self):
+        response = self.client.get(reverse('list-posts'), {'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_count'], 25)
+        self.assertEqual(response.data['total_pages'], 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list-posts'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CountStrategyTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(username="testuser", email="testuser@example.com", password="testpassword")
+        self.reader = UserFactory(username="reader", email="reader@example.com", team=TeamFactory(), password="testpassword")
+        self.Public_category = CategoriesFactory(category_name='Public')
+        self.Authenticated_category = CategoriesFactory(category_name='Authenticated')
+        for i in range(12):
+            self.create_post(i)
+
+    def create_post(self, i):
+        return PostFactory(author=self.user, title=f'title post {i}',
+            permissions_set=[
+                {'category': self.Public_category, 'access': 'read'},
+                {'category': self.Authenticated_category, 'access': 'read'}
+            ])
+
+    def test_small_result_is_counted_exactly(self):
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.data['total_count'], 12)
+        self.assertFalse(response.data['count_is_approximate'])
+
+    @override_settings(PAGINATION_EXACT_COUNT_LIMIT=5)
+    def test_large_result_count_is_cached(self):
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.data['total_count'], 12)
+        self.assertFalse(response.data['count_is_approximate'])
+
+        self.create_post(12)
+        response = self.client.get(reverse('list-posts'), {'page': 2})
+        self.assertEqual(response.data['total_count'], 12)
+        self.assertTrue(response.data['count_is_approximate'])
+
+        self.client.login(username='reader', password='testpassword')
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.data['total_count'], 13)
+
+    @override_settings(PAGINATION_EXACT_COUNT_LIMIT=5, PAGINATION_ESTIMATED_COUNT_THRESHOLD=0)
+    def test_very_large_result_uses_planner_estimate(self):
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['count_is_approximate'])
+
+
+class ReconcilePostCountsTest(TestCase):
+
+    def test_reconcile_fixes_drift(self):
+        post = PostFactory()
+        LikeFactory(post=post)
+        LikeFactory(post=post)
+        CommentsFactory(post=post)
+        Post.objects.filter(pk=post.pk).update(like_count=7, comment_count=0)
+
+        call_command('reconcile_post_counts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 2)
+        self.assertEqual(post.comment_count, 1)
+
+        out = StringIO()
+        call_command('reconcile_post_counts', stdout=out)
+        self.assertIn('fixed 0', out.getvalue())
+
+
+class AccessiblePostFilterTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.team1 = TeamFactory(tname="Test Team 1")
+        self.team2 = TeamFactory(tname="Test Team 2")
+        self.user1 = UserFactory(username="testuser1", email="testuser1@example.com", team=self.team1, password="testpassword")
+        self.user2 = UserFactory(username="testuser2", email="testuser2@example.com", team=self.team2, password="testpassword")
+        self.categories = [
+            CategoriesFactory(category_name='Public'),
+            CategoriesFactory(category_name='Authenticated'),
+            CategoriesFactory(category_name='Team'),
+            CategoriesFactory(category_name='Author'),
+        ]
+        self.post = PostFactory(author=self.user1, title='team post',
+            permissions_set=[{'category': self.categories[2], 'access': 'read'}])
+
+    def test_comments_and_likes_are_filtered_in_the_database(self):
+        visible = PostFactory(author=self.user1, permissions_set=[{'category': self.categories[1], 'access': 'read'}])
+        for post in [self.post, visible]:
+            CommentsFactory(post=post)
+            LikeFactory(post=post)
+        self.client.force_authenticate(user=self.user2)
+        for name, table in [('comments-list', 'comments_comments'), ('like-list', 'likes_like')]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+            self.assertEqual([row['post'] for row in response.data['results']], [visible.pk])
+            # The visibility check is a subquery on posts, not a list of ids.
+            sql = next(query['sql'] for query in queries if f'FROM "{table}"' in query['sql'] and 'COUNT' not in query['sql'])
+            self.assertIn('FROM "posts_post"', sql)
+
+    def test_permission_change_shows_at_once(self):
+        CommentsFactory(post=self.post)
+        self.client.force_authenticate(user=self.user2)
+        self.assertEqual(self.client.get(reverse('comments-list')).data['results'], [])
+        Permission.objects.create(post=self.post, category=self.categories[1], access='read')
+        self.assertEqual(len(self.client.get(reverse('comments-list')).data['results']), 1)
+
+    @override_settings(PAGINATION_EXACT_COUNT_LIMIT=0)
+    def test_cached_counts_follow_visibility_changes(self):
+        self.client.force_authenticate(user=self.user2)
+        readable = [{'category': self.categories[1], 'access': 'read'}]
+        PostFactory(author=self.user1, permissions_set=readable)
+        self.assertEqual(self.client.get(reverse('list-posts')).data['total_count'], 1)
+
+        PostFactory(author=self.user1, permissions_set=readable)
+        self.assertEqual(self.client.get(reverse('list-posts')).data['total_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Permission.objects.create(post=self.post, category=self.categories[1], access='read')
+        response = self.client.get(reverse('list-posts'))
+        self.assertEqual(response.data['total_count'], 3)
+        self.assertFalse(response.data['count_is_approximate'])
+
+    def test_rollback_keeps_version(self):
+        version = visibility_version(self.user2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Permission.objects.create(post=self.post, category=self.categories[1], access='read')
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(visibility_version(self.user2), version)
+
+    def test_writes_bump_only_the_classes_they_affect(self):
+        admin = UserFactory(team=self.team2, is_admin=True)
+        audiences = [AnonymousUser(), self.user1, self.user2, admin]
+
+        def create_team_post():
+            PostFactory(author=self.user1, permissions_set=[{'category': self.categories[2], 'access': 'read'}])
+
+        def open_to_public():
+            Permission.objects.create(post=self.post, category=self.categories[0], access='read')
+
+        def upgrade_team_access():
+            permission = Permission.objects.get(post=self.post, category=self.categories[2])
+            permission.access = 'read_edit'
+            permission.save()
+
+        def open_to_signed_in():
+            Permission.objects.create(post=self.post, category=self.categories[1], access='read')
+
+        steps = [
+            # Reaches user1, as author's teammate, and admins.
+            (create_team_post, [False, True, False, True]),
+            (open_to_public, [True, False, False, False]),
+            # The team could already read the post.
+            (upgrade_team_access, [False, False, False, False]),
+            # Reaches user2, in another team; every signed-in user shares the authenticated scope.
+            (open_to_signed_in, [False, True, True, False]),
+        ]
+        for write, expected in steps:
+            with self.subTest(write=write.__name__):
+                before = [visibility_version(user) for user in audiences]
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                self.assertEqual([visibility_version(user) != version for user, version in zip(audiences, before)],
+                                 expected)
+
+    def test_team_change_bumps_both_teams(self):
+        teammate = UserFactory(team=self.team2)
+        versions = [visibility_version(self.user1), visibility_version(teammate)]
+        user2 = type(self.user2).objects.get(pk=self.user2.pk)
+        user2.team = self.team1
+        with self.captureOnCommitCallbacks(execute=True):
+            user2.save()
+        self.assertNotEqual(visibility_version(self.user1), versions[0])
+        self.assertNotEqual(visibility_version(teammate), versions[1])
+        self.assertEqual(list(get_accessible_posts(user2).values_list('id', flat=True)), [self.post.pk])
+
+    def test_author_reads_own_post_right_after_create(self):
+        self.client.login(username='testuser2', password='testpassword')
+        post_data = {
+            'title': 'Fresh post',
+            'content': 'Fresh content',
+            'permissions_set': [
+                {'category': 'Public', 'access': 'none'},
+                {'category': 'Authenticated', 'access': 'none'},
+                {'category': 'Team', 'access': 'none'},
+                {'category': 'Author', 'access': 'read'}
+            ]
+        }
+        response = self.client.post(reverse('list-posts'), post_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(title='Fresh post')
+        CommentsFactory(post=post, user=self.user2)
+        response = self.client.get(reverse('comments-list'), {'post': post.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_login_does_not_bump_version(self):
+        version = visibility_version(self.user2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='testuser2', password='testpassword')
+        self.assertEqual(visibility_version(self.user2), version)
+
+
+class ConditionalRequestTest(APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory(username="testuser", email="testuser@example.com", password="testpassword")
+        self.categories = [
+            CategoriesFactory(category_name='Public'),
+            CategoriesFactory(category_name='Authenticated'),
+            CategoriesFactory(category_name='Team'),
+            CategoriesFactory(category_name='Author'),
+        ]
+        self.post = PostFactory(author=self.user, title='title post',
+            permissions_set=[
+                {'category': self.categories[0], 'access': 'read_edit'},
+                {'category': self.categories[3], 'access': 'read_edit'}
+            ])
+        self.url = reverse('post-detail', kwargs={'pk': self.post.pk})
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        LikeFactory(post=self.post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_is_not_trusted_after_a_like(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        LikeFactory(post=self.post)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['like_count'], 1)
+
+    def test_list_not_modified(self):
+        url = reverse('list-posts')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        PostFactory(author=self.user, title='new post',
+            permissions_set=[{'category': self.categories[0], 'access': 'read'}])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'new post')
+
+    def test_if_match_on_update(self):
+        etag = self.client.get(self.url)['ETag']
+        data = {'title': 'Updated title'}
+        response = self.client.patch(self.url, data, format='json', HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'title post')
+
+        updated_data = {
+            'title': 'Updated title',
+            'content': 'Updated content',
+            'permissions_set': [
+                {'category': 'Public', 'access': 'read_edit'},
+                {'category': 'Authenticated', 'access': 'none'},
+                {'category': 'Team', 'access': 'none'},
+                {'category': 'Author', 'access': 'read_edit'}
+            ]
+        }
+        response = self.client.put(self.url, updated_data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.put(self.url, updated_data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+
+class QueryPlanTest(TestCase):
+    """Fails when a hot viewset query can only be answered by a sequential scan.
+
+    Sequential scans are disabled for the planner, so one still showing up
+    means no index can serve the query. On so few rows any index would do,
+    so filtered feeds also assert the index built for their filter.
+    """
+    LARGE_TABLES = {'posts_post', 'posts_permission', 'comments_comments', 'likes_like'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.team = TeamFactory()
+        cls.user = UserFactory(team=cls.team)
+        cls.admin = UserFactory(is_admin=True)
+        categories = [CategoriesFactory(category_name=name) for name in ['Public', 'Authenticated', 'Team', 'Author']]
+        authors = [cls.user] + [UserFactory(team=cls.team) for _ in range(3)] + [UserFactory() for _ in range(3)]
+        for i in range(40):
+            post = PostFactory(author=authors[i % len(authors)], permissions_set=[
+                {'category': category, 'access': ['none', 'read', 'read_edit'][(i + j) % 3]}
+                for j, category in enumerate(categories)
+            ])
+            LikeFactory(post=post, user=authors[(i + 1) % len(authors)])
+            CommentsFactory(post=post, user=authors[(i + 2) % len(authors)])
+        cls.post = PostFactory(author=authors[-1], permissions_set=[
+            {'category': category, 'access': 'read'} for category in categories
+        ])
+
+    def setUp(self):
+        cache.clear()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def view_queryset(self, view_class, user, params=None):
+        http_request = APIRequestFactory().get('/', params or {})
+        force_authenticate(http_request, user=user)
+        view = view_class(request=Request(http_request), kwargs={}, format_kwarg=None, action='list')
+        return view.filter_queryset(view.get_queryset())
+
+    def assertNoSeqScan(self, queryset):
+        plan = queryset.explain()
+        scanned = set(re.findall(r'Seq Scan on (\w+)', plan)) & self.LARGE_TABLES
+        self.assertFalse(scanned, f'Sequential scan on {scanned}:\n{queryset.query}\n{plan}')
+
+    def test_posts_feed(self):
+        from apps.posts.views import list_posts_view
+        for user in [AnonymousUser(), self.user, self.admin]:
+            with self.subTest(user=user):
+                queryset = self.view_queryset(list_posts_view, user)
+                self.assertNoSeqScan(queryset[:10])
+                self.assertNoSeqScan(queryset.filter(timestamp__lt=self.post.timestamp)[:10])
+
+    def test_comments_feed(self):
+        from apps.comments.views import CommentsViewSet
+        for user in [AnonymousUser(), self.user, self.admin]:
+            for params, index in [({}, None), ({'post': self.post.pk}, 'comment_post_feed_idx'),
+                                  ({'user': self.user.pk}, 'comment_user_feed_idx')]:
+                with self.subTest(user=user, params=params):
+                    queryset = self.view_queryset(CommentsViewSet, user, params)[:10]
+                    self.assertNoSeqScan(queryset)
+                    if index:
+                        self.assertIn(index, queryset.explain())
+
+    def test_likes_feed(self):
+        from apps.likes.views import LikeViewSet
+        for user in [AnonymousUser(), self.user, self.admin]:
+            for params, index in [({}, None), ({'post': self.post.pk}, 'like_post_feed_idx'),
+                                  ({'user': self.user.pk}, 'like_user_feed_idx')]:
+                with self.subTest(user=user, params=params):
+                    queryset = self.view_queryset(LikeViewSet, user, params)[:10]
+                    self.assertNoSeqScan(queryset)
+                    if index:
+                        self.assertIn(index, queryset.explain())
+
+    def test_search(self):
+        for user in [AnonymousUser(), self.user, self.admin]:
+            with self.subTest(user=user):
+                queryset = search_posts(user, 'performance')
+                self.assertNoSeqScan(queryset[:10])
+                self.assertIn('post_search_idx', queryset.explain())
+                self.assertIn('comment_search_idx', queryset.explain())
+                self.assertNoSeqScan(autocomplete_titles(user, 'Perf'))
+        self.assertIn('post_title_prefix_idx', autocomplete_titles(self.admin, 'Perf').explain())
+
+    def test_permission_lookup(self):
+        permissions = Permission.objects.filter(category__category_name='Public', access__in=['read', 'read_edit'])
+        self.assertNoSeqScan(permissions)
+        self.assertNoSeqScan(Permission.objects.filter(post=self.post).select_related('category'))
+
+
+
+class SeedDatasetTest(TestCase):
+    def seed(self, **options):
+        options = {'teams': 3, 'users': 40, 'posts': 120, 'chunk_size': 50, 'workers': 0, **options}
+        call_command('seed_dataset', stdout=StringIO(), **options)
+
+    def test_rows_are_consistent(self):
+        self.seed()
+        users = User.objects.filter(username__startswith='seed-user-')
+        self.assertEqual(users.count(), 40)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Permission.objects.count(), 4 * 120)
+        self.assertTrue(users.first().check_password('password'))
+        self.assertEqual(len(set(users.values_list('password', flat=True))), 1)
+
+        out = StringIO()
+        call_command('reconcile_post_counts', '--dry-run', stdout=out)
+        self.assertIn('would fix 0', out.getvalue())
+        self.assertFalse(Post.objects.exclude(author_team=F('author__team')).exists())
+        for post in Post.objects.prefetch_related('permissions_set'):
+            stored = [getattr(post, field) for field in VISIBILITY_FIELDS.values()]
+            levels = post.set_visibility([(p.category_id, p.access) for p in post.permissions_set.all()])
+            self.assertEqual(list(levels.values()), stored)
+
+        # Rows created afterwards get ids past the copied ones.
+        last_id = Post.objects.aggregate(last=Max('id'))['last']
+        self.assertGreater(PostFactory().pk, last_id)
+
+
+class SeedDatasetWorkersTest(TransactionTestCase):
+    def test_process_pool(self):
+        call_command('seed_dataset', teams=2, users=20, posts=60, chunk_size=20, workers=2, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Permission.objects.count(), 240)
+        self.assertEqual(Like.objects.count(), sum(Post.objects.values_list('like_count', flat=True)))
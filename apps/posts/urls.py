@@ -4,4 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.list_posts_view.as_view(), name='list-posts'),
     path('<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('engagement/', views.PostEngagementView.as_view(), name='post-engagement'),
+    path('search/', views.PostSearchView.as_view(), name='post-search'),
+    path('search/titles/', views.PostTitleAutocompleteView.as_view(), name='post-title-autocomplete'),
 ]
\ No newline at end of file
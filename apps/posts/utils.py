@@ -1,37 +1,165 @@
-from django.db.models import Prefetch, Q
-from .models import Post, Permission
-from apps.users.models import User
+import hashlib
+import json
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils.http import quote_etag
+from rest_framework.exceptions import ValidationError
+from apps.comments.models import Comments
+from apps.likes.models import Like
+from .models import Post, Permission, ACCESS_READ, ACCESS_READ_EDIT
+from .categories import category_id
 
 def filter_permissions(category_name, access_list):
-    return Permission.objects.filter(category__category_name=category_name, access__in=access_list)
+    return Permission.objects.filter(category_id=category_id(category_name), access__in=access_list)
 
-def get_accessible_posts(user):
+def visibility_filter(user):
     if not user.is_authenticated:
-        permission_filtered = filter_permissions('Public', ['read', 'read_edit'])
-        permissions_prefetch = Prefetch('permissions_set', queryset=permission_filtered)
-        return Post.objects.prefetch_related(permissions_prefetch).filter(
-            permissions_set__in=permission_filtered).distinct().order_by('-timestamp')
+        return Q(public_access__gte=ACCESS_READ)
+
+    if user.is_admin:
+        return Q()
 
-    elif user.is_admin:
+    own = Q(author=user)
+    team = Q(author_team_id=user.team_id)
+    return (
+        (own & Q(author_access__gte=ACCESS_READ)) |
+        (team & ~own & Q(team_access__gte=ACCESS_READ)) |
+        (~team & Q(authenticated_access__gte=ACCESS_READ))
+    )
+
+def get_accessible_posts(user):
+    if user.is_authenticated and user.is_admin:
         return Post.objects.all().order_by('-timestamp')
+    return Post.objects.filter(visibility_filter(user)).order_by('-timestamp')
+
+# Keys of a post's representation, in output order, and the columns each one reads.
+REPRESENTATION_FIELDS = {
+    'id': ['id'],
+    'author': ['author__username'],
+    'title': ['title'],
+    'content': ['content'],
+    'excerpt': ['excerpt'],
+    'timestamp': ['timestamp'],
+    'like_count': ['like_count'],
+    'comment_count': ['comment_count'],
+    'permissions': [],
+    'liked_by_me': [],
+    'commented_by_me': [],
+}
+
+# Per-viewer flags, annotated by with_viewer_flags and False for anonymous users.
+VIEWER_FLAGS = {
+    'liked_by_me': Like,
+    'commented_by_me': Comments,
+}
+
+def requested_fields(query_params):
+    """The representation keys selected with ?fields= or ?exclude=, or None for all of them."""
+    fields = query_params.get('fields')
+    exclude = query_params.get('exclude')
+    if fields is None and exclude is None:
+        return None
+
+    names = set(filter(None, (fields or exclude).split(',')))
+    unknown = names - set(REPRESENTATION_FIELDS)
+    if fields is not None and exclude is not None:
+        raise ValidationError({'fields': 'fields and exclude cannot be combined.'})
+    if unknown:
+        raise ValidationError({'fields' if fields is not None else 'exclude': f"Unknown fields: {', '.join(sorted(unknown))}."})
+    if fields is not None:
+        return [field for field in REPRESENTATION_FIELDS if field in names]
+    return [field for field in REPRESENTATION_FIELDS if field not in names]
 
+def representation_columns(fields):
+    return ['id'] + [column for field in fields for column in REPRESENTATION_FIELDS[field]]
+
+def with_feed_relations(queryset, fields=None):
+    """Load what post_serializer reads for fields: the author with the post, all permissions in one more query.
+
+    With a field selection the SQL projection is narrowed to the requested
+    columns, and the author join and permissions query are skipped when not needed.
+    """
+    if fields is None:
+        fields = list(REPRESENTATION_FIELDS)
     else:
-        
-        permission_filtered = filter_permissions('Author', ['read', 'read_edit'])
-        permissions_prefetch = Prefetch('permissions_set', queryset=permission_filtered)
-        Author = Post.objects.prefetch_related(permissions_prefetch).filter(author=user, permissions_set__in=permission_filtered).distinct()
-
-        permission_filtered = filter_permissions('Team', ['read', 'read_edit'])
-        permissions_prefetch = Prefetch('permissions_set', queryset=permission_filtered)
-        team_members = User.objects.filter(team=user.team).exclude(id=user.id)
-        Team = Post.objects.prefetch_related(permissions_prefetch).filter(
-            author__in=team_members, permissions_set__in=permission_filtered).distinct()
-
-        permission_filtered = filter_permissions('Authenticated', ['read', 'read_edit'])
-        permissions_prefetch = Prefetch('permissions_set', queryset=permission_filtered)
-        Authenticated = Post.objects.prefetch_related(permissions_prefetch).filter(
-            permissions_set__in=permission_filtered).exclude(
-            Q(author=user) | Q(author__in=team_members)
-        ).distinct()
-        Accesible_post=Author | Team | Authenticated
-        return Accesible_post.order_by('-timestamp')
\ No newline at end of file
+        queryset = queryset.only(*representation_columns(fields))
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    if 'permissions' in fields:
+        permissions = Permission.objects.only('id', 'post_id', 'category_id', 'access')
+        queryset = queryset.prefetch_related(Prefetch('permissions_set', queryset=permissions))
+    return queryset
+
+def with_viewer_flags(queryset, user, fields=None):
+    """Annotate the requested VIEWER_FLAGS for user, each an EXISTS on the (post, user) index of its table.
+
+    The flags are evaluated inside the posts query itself, so a page costs
+    no extra queries however many posts it holds.
+    """
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(**{
+        flag: Exists(model.objects.filter(post=OuterRef('pk'), user=user))
+        for flag, model in VIEWER_FLAGS.items()
+        if fields is None or flag in fields
+    })
+
+def copy_viewer_flags(source, target):
+    for flag in VIEWER_FLAGS:
+        if hasattr(source, flag):
+            setattr(target, flag, getattr(source, flag))
+
+def access_level(user, post):
+    if not user.is_authenticated:
+        return post.public_access
+
+    if user.is_admin:
+        return ACCESS_READ_EDIT
+
+    if user.id == post.author_id:
+        return post.author_access
+
+    if user.team_id == post.author_team_id:
+        return post.team_access
+
+    return post.authenticated_access
+
+def visibility_class(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+
+    if user.is_admin:
+        return 'admin'
+
+    return f'user:{user.id}:team:{user.team_id}'
+
+def accessible_post_ids(user):
+    """Subquery of the ids of the posts user can read, or None for admins, who can read every post.
+
+    Filtering with post_id__in on it keeps the visibility check inside the
+    comments or likes query, on the indexed visibility columns.
+    """
+    if user.is_authenticated and user.is_admin:
+        return None
+    return Post.objects.filter(visibility_filter(user)).values('id')
+
+# Every field a post's representation can change with; enough to compute its ETag.
+VERSION_FIELDS = ['id', 'timestamp', 'updated_at', 'like_count', 'comment_count']
+
+def post_version(post):
+    version = f'{post.pk}:{post.updated_at.isoformat()}:{post.like_count}:{post.comment_count}'
+    # The viewer flags are part of the representation, so they are part of its version too.
+    for flag in VIEWER_FLAGS:
+        if hasattr(post, flag):
+            version = f'{version}:{flag}={int(getattr(post, flag))}'
+    return version
+
+def post_etag(post, fields=None):
+    version = post_version(post)
+    if fields is not None:
+        version = f"{version}:{','.join(fields)}"
+    return quote_etag(hashlib.md5(version.encode()).hexdigest())
+
+def post_list_etag(posts, page_meta, fields=None):
+    versions = [post_version(post) for post in posts]
+    payload = json.dumps([versions, page_meta] + ([fields] if fields is not None else []), sort_keys=True, default=str)
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
@@ -1,13 +1,21 @@
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q, Prefetch
-from .serializers import PermissionsSerializer, post_serializer
-from .models import Post, Permission, Categories
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q, Prefetch, prefetch_related_objects
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .serializers import EngagementQuerySerializer, PermissionsSerializer, post_serializer
+from .models import Post, Permission, Categories, ACCESS_READ
 from apps.users.models import User
 from .permissions import CanViewPost
-from .pagination import PostsPagination
-from .utils import get_accessible_posts
+from .pagination import PostsPagination, SearchPagination
+from .search import search_posts, autocomplete_titles
+from .access import ACCESS_FIELDS, get_access_levels
+from .engagement import post_engagement
+from .utils import (get_accessible_posts, with_feed_relations, with_viewer_flags, copy_viewer_flags,
+                    requested_fields, representation_columns, post_etag, post_list_etag, VERSION_FIELDS)
 
 class list_posts_view(generics.ListCreateAPIView):
     serializer_class = post_serializer
@@ -21,7 +29,38 @@ class list_posts_view(generics.ListCreateAPIView):
     
     def get_queryset(self):
         current_user = self.request.user
-        return get_accessible_posts(current_user)
+        queryset = get_accessible_posts(current_user)
+        if self.request.method == 'GET':
+            queryset = with_viewer_flags(queryset, current_user, requested_fields(self.request.query_params))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['fields'] = requested_fields(self.request.query_params)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        # Paginate over version fields only, so an unchanged page is answered
+        # with a 304 before any full rows are loaded or serialized.
+        fields = requested_fields(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.only(*VERSION_FIELDS))
+        page_meta = self.paginator.get_paginated_response([]).data
+        etag = post_list_etag(page, page_meta, fields)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            posts = with_feed_relations(Post.objects, fields).in_bulk([post.pk for post in page])
+            for post in page:
+                if post.pk in posts:
+                    copy_viewer_flags(post, posts[post.pk])
+            serializer = self.get_serializer([posts[post.pk] for post in page if post.pk in posts], many=True)
+            response = self.get_paginated_response(serializer.data)
+        response['ETag'] = etag
+        if page:
+            response['Last-Modified'] = http_date(max(post.updated_at for post in page).timestamp())
+        return response
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -32,10 +71,109 @@ class list_posts_view(generics.ListCreateAPIView):
 
 class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [CanViewPost]
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('author')
     serializer_class = post_serializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in ['PUT', 'PATCH']:
+            queryset = queryset.select_for_update(of=('self',))
+        if self.request.method == 'GET':
+            fields = requested_fields(self.request.query_params)
+            if fields is not None:
+                # Keep what the permission check and the validators read.
+                columns = set(representation_columns(fields) + ACCESS_FIELDS + VERSION_FIELDS)
+                if 'author' not in fields:
+                    queryset = queryset.select_related(None)
+                queryset = queryset.only(*columns)
+            queryset = with_viewer_flags(queryset, self.request.user, fields)
+        elif self.request.method in ['PUT', 'PATCH']:
+            # The validators returned with the update carry the flags, like those of a GET.
+            queryset = with_viewer_flags(queryset, self.request.user)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['fields'] = requested_fields(self.request.query_params)
+        return context
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        fields = requested_fields(request.query_params)
+        # ETag only: like and comment counts and the viewer flags change without touching updated_at.
+        response = get_conditional_response(request, etag=post_etag(instance, fields))
+        if response is None:
+            if fields is None or 'permissions' in fields:
+                prefetch_related_objects([instance], 'permissions_set')
+            response = Response(self.get_serializer(instance).data)
+        return self.add_validators(response, instance, fields)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        with transaction.atomic():
+            # The row stays locked until the update commits, so If-Match is
+            # checked against the version that is actually being replaced.
+            instance = self.get_object()
+            response = get_conditional_response(request, etag=post_etag(instance))
+            if response is not None:
+                return self.add_validators(response, instance)
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        instance.refresh_from_db(fields=VERSION_FIELDS)
+        return self.add_validators(Response(serializer.data), instance)
+
+    def add_validators(self, response, instance, fields=None):
+        response['ETag'] = post_etag(instance, fields)
+        response['Last-Modified'] = http_date(instance.updated_at.timestamp())
+        return response
+
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response({"message": "post deleted"}, status=status.HTTP_204_NO_CONTENT)
+
+
+class PostSearchView(generics.ListAPIView):
+    permission_classes = [AllowAny]
+    serializer_class = post_serializer
+    pagination_class = SearchPagination
+
+    def get_query_text(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        return text
+
+    def get_queryset(self):
+        return search_posts(self.request.user, self.get_query_text())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = requested_fields(self.request.query_params)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        fields = requested_fields(request.query_params)
+        page = self.paginate_queryset(self.get_queryset().only('id'))
+        posts = with_viewer_flags(with_feed_relations(Post.objects, fields), request.user, fields).in_bulk(
+            [post.pk for post in page])
+        serializer = self.get_serializer([posts[post.pk] for post in page if post.pk in posts], many=True)
+        return self.get_paginated_response(serializer.data)
+
+class PostTitleAutocompleteView(PostSearchView):
+    def list(self, request, *args, **kwargs):
+        return Response(list(autocomplete_titles(request.user, self.get_query_text())))
+
+class PostEngagementView(generics.GenericAPIView):
+    """Like and comment summary of up to 100 posts, given as ?ids=1,2,3; posts the user cannot read are left out."""
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        params = EngagementQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        post_ids = params.validated_data['ids']
+        levels = get_access_levels(request, post_ids)
+        readable = [post_id for post_id in post_ids if post_id in levels and levels[post_id] >= ACCESS_READ]
+        return Response({'results': post_engagement(readable, params.validated_data['likers'])})
@@ -49,6 +49,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so post_save receivers can tell when a user changed team.
+        instance._loaded_team_id = instance.__dict__.get('team_id')
+        return instance
+
     def __str__(self):
         return self.username
 
@@ -0,0 +1,47 @@
+"""
+Shows what connection reuse takes off the latency of cheap endpoints.
+
+The same server command is run once per database connection mode (a new
+connection per request, persistent connections, and the psycopg pool),
+selected through the DB_* environment variables read by settings.py. With
+reuse, p50 should drop by roughly the cost of a PostgreSQL connection setup.
+
+    python loadtest/connection_reuse.py --connections 50 --duration 20
+"""
+import argparse
+import os
+
+from wsgi_vs_asgi import SERVERS, run_server
+
+MODES = {
+    'per-request': {'DB_POOL': '0', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': '0', 'DB_CONN_MAX_AGE': '600'},
+    'pool': {'DB_POOL': '1'},
+}
+# One or two indexed queries each, so connection setup is a large share of the request.
+PATHS = ['/post/0/', '/post/?fields=id&pagination=cursor&page_size=1']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--paths', nargs='*', default=PATHS)
+    parser.add_argument('--modes', nargs='*', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--server', default='wsgi', choices=list(SERVERS))
+    parser.add_argument('--command', help='Overrides the server command line.')
+    args = parser.parse_args()
+
+    command = args.command or SERVERS[args.server].format(host=args.host, port=args.port, workers=args.workers)
+    print(f"{'mode':<12}{'req/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for mode in args.modes:
+        # report() pads the name to six characters; widen it for the mode column.
+        print(run_server(f'{mode:<12}', command, args, env=MODES[mode]), flush=True)
+
+
+if __name__ == '__main__':
+    main()
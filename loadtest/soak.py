@@ -0,0 +1,385 @@
+"""
+Replays a weighted mix of user scenarios against a running server and
+reports throughput, latency, errors and database connections over time.
+
+Each virtual user keeps its own keep-alive connection and cookies, and
+loops over scenarios picked by weight:
+
+    browse   feed page, sometimes followed by the next page
+    open     post detail with its comments and likes
+    like     like a post, then take the like back
+    comment  comment on a post
+    login    sign in on a fresh session (sessions pile up, like app installs)
+    logout   sign out
+
+Likes and comments aim at one hot post --hot-share of the time, to show
+contention on a single row. Signed-in users come from the database (e.g.
+seeded with manage.py seed_dataset, whose users share --password).
+
+    python manage.py runserver --noreload   # or gunicorn/uvicorn
+    python loadtest/soak.py --users 200 --duration 600 --mix browse=60,open=25,like=8,comment=4,login=3
+    python loadtest/soak.py --preset login-storm --output soak.json
+
+The mix is also accepted as a JSON object with --mix-file, to keep
+production traffic shapes next to the code.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRESETS = {
+    'read-heavy': {'browse': 60, 'open': 30, 'like': 5, 'comment': 2, 'login': 2, 'logout': 1},
+    'write-heavy': {'browse': 25, 'open': 20, 'like': 30, 'comment': 20, 'login': 3, 'logout': 2},
+    'login-storm': {'browse': 20, 'open': 10, 'login': 65, 'logout': 5},
+}
+SIGNED_IN_SCENARIOS = {'like', 'comment', 'logout'}
+
+
+class HttpSession:
+    """One keep-alive HTTP/1.1 connection with a cookie jar, speaking JSON."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(data).encode() if data is not None else b''
+        headers = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', 'Accept: application/json']
+        if body or method not in ('GET', 'HEAD'):
+            headers += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if 'csrftoken' in self.cookies and method not in ('GET', 'HEAD'):
+            headers.append(f"X-CSRFToken: {self.cookies['csrftoken']}")
+        try:
+            self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+            await self.writer.drain()
+            status, response_headers, content = await self.read_response()
+        except BaseException:
+            self.close()
+            raise
+        for name, value in response_headers:
+            if name == 'set-cookie':
+                self.store_cookie(value)
+            elif name == 'connection' and value.lower() == 'close':
+                self.close()
+        return status, content
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed')
+        status = int(status_line.split()[1])
+        headers = []
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((name.strip().lower(), value.strip()))
+        fields = dict(headers)
+        if 'chunked' in fields.get('transfer-encoding', ''):
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunks.append(await self.reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            content = b''.join(chunk[:-2] for chunk in chunks)
+        else:
+            content = await self.reader.readexactly(int(fields.get('content-length', 0)))
+        return status, headers, content
+
+    def store_cookie(self, header):
+        pair, *attributes = header.split(';')
+        name, _, value = pair.strip().partition('=')
+        expired = any(attribute.strip().lower() == 'max-age=0' for attribute in attributes)
+        if expired or value in ('', '""'):
+            self.cookies.pop(name, None)
+        else:
+            self.cookies[name] = value
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Recorder:
+    """Collects every request's outcome, bucketed by --interval for the time series."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.buckets = defaultdict(lambda: {'latencies': [], 'errors': 0, 'client_errors': 0})
+        self.db_samples = {}
+
+    def add(self, name, status, latency):
+        self.latencies[name].append(latency)
+        self.statuses[name][status] += 1
+        bucket = self.buckets[int((time.monotonic() - self.start) // self.interval)]
+        bucket['latencies'].append(latency)
+        if status is None or status >= 500:
+            bucket['errors'] += 1
+        elif status >= 400:
+            bucket['client_errors'] += 1
+
+
+class VirtualUser:
+    def __init__(self, args, recorder, state, credentials):
+        self.args = args
+        self.recorder = recorder
+        self.state = state
+        self.credentials = credentials
+        self.session = HttpSession(args.host, args.port)
+        self.signed_in = False
+        self.post_ids = []
+
+    async def call(self, name, method, path, data=None):
+        start = time.perf_counter()
+        try:
+            status, content = await self.session.request(method, path, data)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            self.recorder.add(name, None, (time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.05)
+            return None, None
+        self.recorder.add(name, status, (time.perf_counter() - start) * 1000)
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+    def pick_post(self, hot=False):
+        post_ids = self.post_ids if self.signed_in and self.post_ids else self.state['post_ids']
+        if hot and random.random() < self.args.hot_share:
+            hot_post = self.state['post_ids'][0]
+            return hot_post if hot_post in post_ids else post_ids[0]
+        return random.choice(post_ids)
+
+    async def browse(self):
+        status, data = await self.call('feed', 'GET', '/post/')
+        if status == 200 and data and data.get('next_page_url') and random.random() < 0.3:
+            next_page = urlsplit(data['next_page_url'])._replace(scheme='', netloc='').geturl()
+            await self.call('feed-next', 'GET', next_page)
+
+    async def open(self):
+        post_id = self.pick_post()
+        status, _ = await self.call('post-detail', 'GET', f'/post/{post_id}/')
+        if status == 200:
+            await self.call('post-comments', 'GET', f'/comments/?post={post_id}')
+            await self.call('post-likes', 'GET', f'/likes/?post={post_id}')
+
+    async def like(self):
+        path = f'/likes/post/{self.pick_post(hot=True)}/'
+        status, _ = await self.call('like', 'PUT', path)
+        if status == 200:
+            await self.call('unlike', 'DELETE', path)
+
+    async def comment(self):
+        await self.call('comment', 'POST', '/comments/', {'post': self.pick_post(hot=True), 'comment': 'Load test comment'})
+
+    async def login(self):
+        if not self.credentials:
+            return
+        # A fresh cookie jar leaves the previous session row behind, like a new device would.
+        self.session.cookies.clear()
+        username = random.choice(self.credentials)
+        status, _ = await self.call('login', 'POST', '/user/login/', {'username': username, 'password': self.args.password})
+        self.signed_in = status == 200
+        if self.signed_in:
+            # Likes and comments go to posts this account can read.
+            status, data = await self.call('feed', 'GET', '/post/?fields=id')
+            self.post_ids = [post['id'] for post in data['results']] if status == 200 else []
+
+    async def logout(self):
+        status, _ = await self.call('logout', 'POST', '/user/logout/')
+        if status == 200:
+            self.signed_in = False
+
+    async def run(self, mix, deadline):
+        scenarios, weights = zip(*mix.items())
+        while time.monotonic() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            if scenario in SIGNED_IN_SCENARIOS and not self.signed_in:
+                if scenario == 'logout' or not self.credentials:
+                    continue
+                await self.login()
+                if not self.signed_in:
+                    continue
+            await getattr(self, scenario)()
+            if self.args.think_ms:
+                await asyncio.sleep(random.expovariate(1000 / self.args.think_ms))
+        self.session.close()
+
+
+def database_sampler():
+    """Returns a function reporting server connections and session rows, or None without database access."""
+    try:
+        sys.path.insert(0, ROOT)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Avanzablog.settings')
+        import django
+        django.setup()
+        from django.db import connection
+    except Exception as exc:
+        print(f'database stats disabled: {exc}', file=sys.stderr)
+        return None
+
+    def sample():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*), count(*) FILTER (WHERE state = 'active'), "
+                "(SELECT count(*) FROM django_session WHERE expire_date > now()) "
+                "FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()"
+            )
+            connections, active, sessions = cursor.fetchone()
+        return {'connections': connections, 'active': active, 'sessions': sessions}
+    return sample
+
+
+def signed_in_usernames(prefix, limit):
+    from apps.users.models import User
+    users = User.objects.filter(is_active=True, username__startswith=prefix).order_by('id')
+    return list(users.values_list('username', flat=True)[:limit])
+
+
+async def sample_database(sampler, recorder, deadline):
+    while time.monotonic() < deadline:
+        bucket = int((time.monotonic() - recorder.start) // recorder.interval)
+        try:
+            recorder.db_samples[bucket] = await asyncio.to_thread(sampler)
+        except Exception as exc:
+            recorder.db_samples[bucket] = {'error': str(exc)}
+        await asyncio.sleep(recorder.interval)
+
+
+async def soak(args, mix, credentials, sampler):
+    anonymous = HttpSession(args.host, args.port)
+    state = {'post_ids': []}
+    status, content = await anonymous.request('GET', '/post/?fields=id')
+    anonymous.close()
+    if status == 200:
+        state['post_ids'] = [post['id'] for post in json.loads(content)['results']]
+    if not state['post_ids']:
+        raise SystemExit('the feed is empty; seed the database first (manage.py seed_dataset)')
+
+    recorder = Recorder(args.interval)
+    deadline = recorder.start + args.duration
+    users = [VirtualUser(args, recorder, state, credentials) for _ in range(args.users)]
+    tasks = [user.run(mix, deadline) for user in users]
+    if sampler:
+        tasks.append(sample_database(sampler, recorder, deadline))
+    await asyncio.gather(*tasks)
+    recorder.elapsed = time.monotonic() - recorder.start
+    return recorder
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        return [latencies[0]] * 3 if latencies else [0.0] * 3
+    cuts = statistics.quantiles(latencies, n=100)
+    return [cuts[49], cuts[94], cuts[98]]
+
+
+def report(recorder, args):
+    series = []
+    print(f"{'t (s)':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'5xx %':>8}{'4xx %':>8}"
+          f"{'db conn':>9}{'active':>8}{'sessions':>10}")
+    for index in sorted(set(recorder.buckets) | set(recorder.db_samples)):
+        bucket = recorder.buckets.get(index, {'latencies': [], 'errors': 0, 'client_errors': 0})
+        total = len(bucket['latencies'])
+        p50, p95, p99 = percentiles(bucket['latencies'])
+        db = recorder.db_samples.get(index, {})
+        row = {
+            't': index * recorder.interval, 'rps': total / recorder.interval, 'p50_ms': p50, 'p95_ms': p95,
+            'p99_ms': p99, 'error_rate': bucket['errors'] / total if total else 0,
+            'client_error_rate': bucket['client_errors'] / total if total else 0, **db,
+        }
+        series.append(row)
+        print(f"{row['t']:>7.0f}{row['rps']:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{row['error_rate']:>8.1%}"
+              f"{row['client_error_rate']:>8.1%}{db.get('connections', ''):>9}{db.get('active', ''):>8}"
+              f"{db.get('sessions', ''):>10}")
+
+    requests = {}
+    print(f"\n{'request':<15}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for name in sorted(recorder.latencies):
+        latencies = recorder.latencies[name]
+        p50, p95, p99 = percentiles(latencies)
+        statuses = {str(status or 'error'): count for status, count in sorted(
+            recorder.statuses[name].items(), key=lambda item: item[0] or 0)}
+        requests[name] = {'count': len(latencies), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'statuses': statuses}
+        print(f'{name:<15}{len(latencies):>8}{len(latencies) / recorder.elapsed:>9.1f}{p50:>9.1f}{p95:>9.1f}'
+              f"{p99:>9.1f}  {' '.join(f'{status}:{count}' for status, count in statuses.items())}")
+
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    errors = sum(count for counter in recorder.statuses.values() for status, count in counter.items()
+                 if status is None or status >= 500)
+    print(f'\n{total} requests in {recorder.elapsed:.1f}s, {total / recorder.elapsed:.1f} req/s, '
+          f'{errors / total if total else 0:.2%} errors')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'mix': args.mix_weights, 'users': args.users, 'duration': recorder.elapsed,
+                       'requests': requests, 'series': series}, output, indent=2)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in filter(None, text.split(',')):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=100, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--interval', type=float, default=5, help='Seconds per time series row.')
+    parser.add_argument('--preset', choices=list(PRESETS), default='read-heavy')
+    parser.add_argument('--mix', help='Scenario weights, e.g. browse=60,open=30,like=10; overrides --preset.')
+    parser.add_argument('--mix-file', help='JSON object of scenario weights; overrides --preset.')
+    parser.add_argument('--hot-share', type=float, default=0.5, help='Share of likes and comments on the hot post.')
+    parser.add_argument('--think-ms', type=float, default=0, help='Mean pause between scenarios of a user.')
+    parser.add_argument('--accounts', type=int, default=1000, help='Distinct accounts users sign in with.')
+    parser.add_argument('--account-prefix', default='seed-user-', help='Username prefix of those accounts.')
+    parser.add_argument('--password', default='password', help='Password of those accounts.')
+    parser.add_argument('--no-db-stats', action='store_true', help='Skip sampling pg_stat_activity and sessions.')
+    parser.add_argument('--output', help='Writes the summary and time series as JSON.')
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url)
+    args.host, args.port = url.hostname, url.port or 80
+    if args.mix_file:
+        with open(args.mix_file) as mix_file:
+            mix = {name: float(weight) for name, weight in json.load(mix_file).items()}
+    else:
+        mix = parse_mix(args.mix) if args.mix else PRESETS[args.preset]
+    unknown = set(mix) - set(PRESETS['read-heavy'])
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.mix_weights = mix
+
+    sampler = None if args.no_db_stats else database_sampler()
+    credentials = signed_in_usernames(args.account_prefix, args.accounts) if sampler else []
+    if not credentials and SIGNED_IN_SCENARIOS & {name for name, weight in mix.items() if weight}:
+        print('no accounts available; like, comment and logout are skipped', file=sys.stderr)
+    report(asyncio.run(soak(args, mix, credentials, sampler)), args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Compares the read endpoints served by a WSGI server against the ASGI
+application, under many concurrent keep-alive connections.
+
+Each server is started in turn, hammered for --duration seconds by
+--connections client connections, and stopped. Requests/sec, latency
+percentiles and error counts are reported per server. The client uses only
+the standard library; the servers need gunicorn and uvicorn installed:
+
+    pip install gunicorn uvicorn
+    python loadtest/wsgi_vs_asgi.py --connections 500 --duration 30
+
+Point it at a seeded database (manage.py benchmark_feed --seed) so the
+queries do real work.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'wsgi': 'gunicorn Avanzablog.wsgi:application --bind {host}:{port} --workers {workers} --threads 32',
+    'asgi': 'uvicorn Avanzablog.asgi:application --host {host} --port {port} --workers {workers} --no-access-log',
+}
+PATHS = ['/post/', '/post/?page=2', '/post/?pagination=cursor', '/comments/', '/likes/']
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = None
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def connection(host, port, paths, deadline, stats):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            path = random.choice(paths)
+            start = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n\r\n'.encode())
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            stats['latencies'].append((time.perf_counter() - start) * 1000)
+            if status >= 500:
+                stats['errors'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats['errors'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def load(host, port, paths, connections, duration):
+    stats = {'latencies': [], 'errors': 0}
+    start = time.monotonic()
+    deadline = start + duration
+    await asyncio.gather(*(connection(host, port, paths, deadline, stats) for _ in range(connections)))
+    # Requests in flight at the deadline still finish, so throughput is over the real elapsed time.
+    stats['elapsed'] = time.monotonic() - start
+    return stats
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex((host, port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'server on {host}:{port} did not start')
+
+
+def run_server(name, command, args, env=None):
+    process = subprocess.Popen(shlex.split(command), cwd=ROOT, env={**os.environ, **(env or {})},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    try:
+        wait_for_port(args.host, args.port)
+        asyncio.run(load(args.host, args.port, args.paths, min(args.connections, 50), args.warmup))
+        stats = asyncio.run(load(args.host, args.port, args.paths, args.connections, args.duration))
+    finally:
+        process.terminate()
+        process.wait()
+    return report(name, stats)
+
+
+def report(name, stats):
+    latencies = sorted(stats['latencies'])
+    if len(latencies) < 2:
+        return f'{name:<6}{"no responses":>12}{stats["errors"]:>10}'
+    percentiles = statistics.quantiles(latencies, n=100)
+    return (f'{name:<6}{len(latencies) / stats["elapsed"]:>12.1f}{percentiles[49]:>10.1f}'
+            f'{percentiles[94]:>10.1f}{percentiles[98]:>10.1f}{stats["errors"]:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--paths', nargs='*', default=PATHS)
+    parser.add_argument('--servers', nargs='*', default=list(SERVERS), choices=list(SERVERS))
+    parser.add_argument('--wsgi-command', help='Overrides the gunicorn command line.')
+    parser.add_argument('--asgi-command', help='Overrides the uvicorn command line.')
+    args = parser.parse_args()
+
+    print(f"{'server':<6}{'req/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for name in args.servers:
+        command = getattr(args, f'{name}_command') or SERVERS[name].format(
+            host=args.host, port=args.port, workers=args.workers)
+        print(run_server(name, command, args), flush=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())